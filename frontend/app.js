@@ -43,7 +43,9 @@ function cardHTML(item) {
   const reg = item.event?.registration || {};
   const media = item.event?.media || {};
   const images = media.images?.items || [];
-  const heroImg = images.length ? images[0].url : "";
+  // prefer the resized local copy from the image cache
+  const hero = item.hero_image || {};
+  const heroImg = hero.file ? `../out/images/${hero.file}` : images.length ? images[0].url : "";
 
   const draft = item.draft || {};
 
@@ -63,6 +65,7 @@ function cardHTML(item) {
     <div class="cardTop">
       <h3>${esc(title)}</h3>
       <span class="badge">${esc(item.change_type || "")}</span>
+      ${item.duplicate_of ? `<span class="badge" title="Looks like event ${esc(item.duplicate_of)}">POSSIBLE DUPLICATE</span>` : ""}
     </div>
 
     ${
@@ -106,19 +109,37 @@ function cardHTML(item) {
   </div>`;
 }
 
-async function reload() {
-  // If you run frontend from /frontend, these relative paths matter:
-  // - delta is in /data
-  // - drafts is in /out
-  const delta = await loadJSON("../data/events_delta.json");
-  const drafts = await loadJSON("../out/drafts.json");
+// Read an NDJSON endpoint line by line, calling onRecord as each record arrives.
+async function streamNDJSON(path, onRecord) {
+  const res = await fetch(path, { cache: "no-store" });
+  if (!res.ok || !res.body) throw new Error(`Failed to load ${path}: ${res.status}`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    buf += decoder.decode(value || new Uint8Array(), { stream: !done });
+    let nl;
+    while ((nl = buf.indexOf("\n")) >= 0) {
+      const line = buf.slice(0, nl).trim();
+      buf = buf.slice(nl + 1);
+      if (line) onRecord(JSON.parse(line));
+    }
+    if (done) break;
+  }
+  if (buf.trim()) onRecord(JSON.parse(buf));
+}
 
-  metaEl.textContent = `run_at: ${delta.summary?.run_at || "-"} | items: ${
-    drafts.items?.length || 0
-  }`;
-  summaryEl.textContent = JSON.stringify(delta.summary || {}, null, 2);
+function renderMeta(deltaSummary, drafts) {
+  metaEl.textContent = `run_at: ${deltaSummary?.run_at || "-"} | items: ${drafts.length}`;
+  summaryEl.textContent = JSON.stringify(deltaSummary || {}, null, 2);
+}
 
-  const items = (drafts.items || []).filter((x) => x.draft); // only successful drafts
+function renderDrafts(deltaSummary, drafts) {
+  renderMeta(deltaSummary, drafts);
+
+  const items = drafts.filter((x) => x.draft); // only successful drafts
 
   if (!items.length) {
     emptyEl.classList.remove("hidden");
@@ -130,6 +151,64 @@ async function reload() {
   cardsEl.innerHTML = items.map(cardHTML).join("\n");
 }
 
+// While task 3 is still drafting, poll for the drafts that have landed since
+const IN_PROGRESS_POLL_MS = 5000;
+let pollTimer = null;
+
+async function reloadStreamed() {
+  // Served by server.py: works for both JSON and normalized JSONL outputs
+  let deltaSummary = {};
+  let inProgress = false;
+  let interrupted = false;
+  await streamNDJSON("/api/delta.ndjson", (rec) => {
+    if (rec.summary && !rec.event_id) deltaSummary = rec.summary;
+  });
+
+  const drafts = [];
+  cardsEl.innerHTML = "";
+  renderMeta(deltaSummary, drafts);
+  await streamNDJSON("/api/drafts.ndjson", (rec) => {
+    if (!rec.event_id) {
+      inProgress = Boolean(rec.summary?.in_progress);
+      interrupted = Boolean(rec.summary?.interrupted);
+      return;
+    }
+    drafts.push(rec);
+    // append just this card: re-rendering every card per record is quadratic on big runs
+    if (rec.draft) {
+      cardsEl.insertAdjacentHTML("beforeend", cardHTML(rec));
+      emptyEl.classList.add("hidden");
+    }
+    renderMeta(deltaSummary, drafts);
+  });
+  if (!cardsEl.children.length) emptyEl.classList.remove("hidden");
+
+  clearTimeout(pollTimer);
+  if (inProgress) {
+    metaEl.textContent += " | drafting in progress…";
+    pollTimer = setTimeout(() => reload().catch(() => {}), IN_PROGRESS_POLL_MS);
+  } else if (interrupted) {
+    metaEl.textContent += " | drafting interrupted (re-run task 3 to finish)";
+  }
+}
+
+async function reloadStatic() {
+  // If you run frontend from /frontend, these relative paths matter:
+  // - delta is in /data
+  // - drafts is in /out
+  const delta = await loadJSON("../data/events_delta.json");
+  const drafts = await loadJSON("../out/drafts.json");
+  renderDrafts(delta.summary, drafts.items || []);
+}
+
+async function reload() {
+  try {
+    await reloadStreamed();
+  } catch (err) {
+    await reloadStatic();
+  }
+}
+
 btnReload.addEventListener("click", reload);
 reload().catch((err) => {
   summaryEl.textContent = "Frontend error:\n" + err.message;
@@ -1,37 +1,350 @@
+import argparse
+import gzip
+import hashlib
+import importlib
+import json
+import os
 import subprocess
 import sys
+import time
+from datetime import datetime
+from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "source"))
+try:
+    from dotenv import load_dotenv  # tasks read .env too; see it here so it counts toward input hashes
+    load_dotenv()
+except ImportError:
+    pass
+import metrics  # noqa: E402
+import profiling  # noqa: E402
+from pipeline_io import iter_delta, iter_drafts  # noqa: E402
+
+RUN_REPORT = metrics.METRICS_DIR / "run_report.json"
+PROFILE_DIR = Path("out/profiles")
+STATE_FILE = Path("out/runner_state.json")
+
+# Keys that change on every run without the content changing; ignored when hashing inputs
+# (marked_at: when task 1 last carried a record forward as stale, see task1 stale_record)
+VOLATILE_KEYS = {"scraped_at", "run_at", "generated_at", "marked_at"}
+
+
+def delta_is_empty() -> bool:
+    return not any("event_id" in rec for rec in iter_delta(with_events=False))
+
+
+def drafts_are_empty() -> bool:
+    return not any("draft" in rec for rec in iter_drafts())
+
+
+def today_sgt() -> str:
+    # task 2's promotion window moves with the calendar, not just with its input file
+    return datetime.now(metrics.SGT).date().isoformat()
+
+
+# Environment that shapes every task's output files
+OUTPUT_ENV = ["OUTPUT_FORMAT", "OUTPUT_COMPACT", "OUTPUT_GZIP"]
+
+# Task graph. "inputs"/"outputs" list every file variant a task may read/write
+# (json or jsonl output formats); whichever exist are hashed, together with the
+# "env" settings, whether the "secrets" are set (not their values) and "hash_extra()".
+# A task with no inputs is never skipped for being unchanged.
 TASKS = [
-    ("Task 1: Scrape SCCCI events", "source/task1_scrape_data.py"),
-    ("Task 2: Detect delta changes", "source/task2_detect_new_data.py"),
-    # Add later:
-    ("Task 3: Draft emails", "source/task3_draft_emails.py"),
-    ("Task 4: Send/Export drafts", "source/task4_send_or_export.py"),
+    {
+        "key": "task1",
+        "name": "Task 1: Scrape events (all sites)",
+        "script": "source/task1_scrape_data.py",
+        "module": "task1_scrape_data",
+        "entry": "main",
+        "after": [],
+        "inputs": [],  # the website: always rerun
+        "outputs": ["data/events_current.json"],
+    },
+    {
+        "key": "task2",
+        "name": "Task 2: Detect delta changes",
+        "script": "source/task2_detect_new_data.py",
+        "module": "task2_detect_new_data",
+        "entry": "main",
+        "after": ["task1"],
+        "inputs": ["data/events_current.json", "data/events_previous.json"],
+        "env": OUTPUT_ENV + ["DEDUP_POLICY", "DEDUP_THRESHOLD", "PROMOTION_WINDOW_DAYS", "PROMOTE_UNDATED"],
+        "hash_extra": today_sgt,
+        "outputs": ["data/events_delta.json", "data/events_delta.jsonl", "data/events_delta.jsonl.gz"],
+    },
+    {
+        "key": "task3",
+        "name": "Task 3: Draft emails",
+        "script": "source/task3_draft_emails.py",
+        "module": "task3_draft_emails",
+        "entry": "main",
+        "after": ["task2"],
+        "inputs": [
+            "data/events_delta.json", "data/events_delta.jsonl", "data/events_delta.jsonl.gz",
+            "data/events.jsonl", "data/events.jsonl.gz",
+        ],
+        "env": OUTPUT_ENV + ["IMAGE_MODE", "IMAGE_BASE_URL"],
+        "secrets": ["GEMINI_API_KEY"],  # run without a key writes empty drafts; rerun once it is set
+        "outputs": ["out/drafts.json", "out/drafts.jsonl", "out/drafts.jsonl.gz"],
+        "skip_if": delta_is_empty,
+    },
+    {
+        "key": "task4",
+        "name": "Task 4: Send/Export drafts",
+        "script": "source/task4_send_or_export.py",
+        "module": "task4_send_or_export",
+        "entry": "send_emails",
+        "after": ["task3"],
+        # always runs: recipients change outside the pipeline, failed sends must be retried,
+        # and sent_emails.json already keeps it from sending an event twice
+        "inputs": [],
+        "outputs": ["out/sent_emails.json"],
+        "skip_if": drafts_are_empty,
+    },
 ]
 
+TASKS_BY_KEY = {t["key"]: t for t in TASKS}
+
+
 def render_bar(done: int, total: int, width: int = 30) -> str:
-    ratio = done / total
+    ratio = done / total if total else 1
     filled = int(ratio * width)
     bar = "█" * filled + "░" * (width - filled)
     pct = ratio * 100
     return f"[{bar}] {pct:5.1f}% ({done}/{total})"
 
-def run_task(name: str, script_path: str):
-    print(f"\n▶ {name}")
-    subprocess.check_call([sys.executable, script_path])
 
-def main():
-    total = len(TASKS)
+# ------------------------
+# Task graph helpers
+# ------------------------
+def task_key(script_path: str) -> str:
+    # "source/task1_scrape_data.py" -> "task1"
+    return Path(script_path).stem.split("_")[0]
+
+
+def parse_task_selection(value: str) -> set[str]:
+    """Accepts "all" or a comma list like "1,3" / "task1,task3"."""
+    if value == "all":
+        return set(TASKS_BY_KEY)
+    keys = set()
+    for part in value.split(","):
+        part = part.strip().lower()
+        if part:
+            keys.add(part if part.startswith("task") else f"task{part}")
+    unknown = keys - set(TASKS_BY_KEY)
+    if unknown:
+        raise SystemExit(f"Unknown task(s): {', '.join(sorted(unknown))}")
+    return keys
+
+
+def topological_order() -> list[dict]:
+    ordered, done = [], set()
+    pending = list(TASKS)
+    while pending:
+        ready = [t for t in pending if all(dep in done for dep in t["after"])]
+        if not ready:
+            raise RuntimeError("Task graph has a cycle: " + ", ".join(t["key"] for t in pending))
+        for t in ready:
+            ordered.append(t)
+            done.add(t["key"])
+            pending.remove(t)
+    return ordered
+
+
+def downstream_of(key: str) -> set[str]:
+    keys = {key}
+    changed = True
+    while changed:
+        changed = False
+        for t in TASKS:
+            if t["key"] not in keys and keys.intersection(t["after"]):
+                keys.add(t["key"])
+                changed = True
+    return keys
+
+
+def select_tasks(only: str, start: str) -> list[dict]:
+    keys = set(TASKS_BY_KEY)
+    if start:
+        first = parse_task_selection(start)
+        if len(first) != 1:
+            raise SystemExit("--from takes a single task")
+        keys = downstream_of(first.pop())
+    if only:
+        keys &= parse_task_selection(only)
+    return [t for t in topological_order() if t["key"] in keys]
+
+
+# ------------------------
+# Content hashing / run state
+# ------------------------
+def strip_volatile(obj):
+    if isinstance(obj, dict):
+        return {k: strip_volatile(v) for k, v in obj.items() if k not in VOLATILE_KEYS}
+    if isinstance(obj, list):
+        return [strip_volatile(v) for v in obj]
+    return obj
+
+
+def hash_file(path: Path, h):
+    """Feed a file into the hash; JSON content is canonicalized without volatile keys."""
+    opener = gzip.open if path.name.endswith(".gz") else open
+    name = path.name[:-3] if path.name.endswith(".gz") else path.name
+    with opener(path, "rb") as f:
+        if name.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    h.update(json.dumps(strip_volatile(json.loads(line)), sort_keys=True).encode("utf-8"))
+        elif name.endswith(".json"):
+            h.update(json.dumps(strip_volatile(json.load(f)), sort_keys=True).encode("utf-8"))
+        else:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+
+
+def inputs_hash(task: dict) -> str:
+    h = hashlib.sha256()
+    for name in task.get("env", []):
+        h.update(f"{name}={os.getenv(name, '')}\n".encode("utf-8"))
+    for name in task.get("secrets", []):
+        h.update(f"{name} set={bool(os.getenv(name, '').strip())}\n".encode("utf-8"))
+    if task.get("hash_extra"):
+        h.update(task["hash_extra"]().encode("utf-8"))
+    for p in task["inputs"]:
+        path = Path(p)
+        if path.exists():
+            h.update(p.encode("utf-8"))
+            hash_file(path, h)
+    return h.hexdigest()
+
+
+def load_state() -> dict:
+    if not STATE_FILE.exists():
+        return {}
+    return json.loads(STATE_FILE.read_text(encoding="utf-8"))
+
+
+def save_state(state: dict):
+    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, STATE_FILE)
+
+
+def skip_reason(task: dict, state: dict, digest: str) -> str:
+    """Why this task can be skipped, or "" if it has to run."""
+    last = state.get(task["key"], {})
+    if task["inputs"] and last.get("inputs_hash") == digest and any(Path(p).exists() for p in task["outputs"]):
+        return "inputs unchanged since last successful run"
+    skip_if = task.get("skip_if")
+    if skip_if and skip_if():
+        return "nothing to do"
+    return ""
+
+
+# ------------------------
+# Running tasks
+# ------------------------
+def run_in_process(task: dict):
+    module = importlib.import_module(task["module"])
+    metrics.reset()
+    getattr(module, task["entry"])()
+
+
+def run_task(task: dict, in_process: bool = False, profile_dir: Path = None, profile_top: int = 25) -> float:
+    script_path = task["script"]
+    print(f"\n▶ {task['name']}")
+    start = time.perf_counter()
+
+    if profile_dir is not None:
+        profiler = str(Path(__file__).resolve().parent / "source" / "profiling.py")
+        try:
+            subprocess.check_call([sys.executable, profiler, script_path, str(profile_dir), str(profile_top)])
+        finally:
+            summary_path = profile_dir / f"{task_key(script_path)}_summary.json"
+            if summary_path.exists():
+                summary = json.loads(summary_path.read_text(encoding="utf-8"))
+                print("Profile:", profiling.summary_line(summary))
+    elif in_process:
+        run_in_process(task)
+    else:
+        subprocess.check_call([sys.executable, script_path])
+
+    return time.perf_counter() - start
+
+
+def write_run_report(started_at: str, wall_times: dict, skipped: dict):
+    """Combine the per-task metric reports of this run into one JSON file."""
+    reports = {r["task"]: r for r in metrics.load_reports()}
+    run = {
+        "started_at": started_at,
+        "finished_at": datetime.now(metrics.SGT).isoformat(),
+        "tasks": [
+            {"script": script, "wall_s": round(wall, 3), "report": reports.get(task_key(script), {})}
+            for script, wall in wall_times.items()
+        ],
+        "skipped": skipped,
+    }
+    run["total_s"] = round(sum(wall_times.values()), 3)
+    RUN_REPORT.parent.mkdir(parents=True, exist_ok=True)
+    RUN_REPORT.write_text(json.dumps(run, ensure_ascii=False, indent=2), encoding="utf-8")
+    return RUN_REPORT
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SCCCI event pipeline.")
+    parser.add_argument("--only", default="", help="Run only these tasks, e.g. --only 2,3")
+    parser.add_argument("--from", dest="start", default="", help="Start at this task and run everything after it")
+    parser.add_argument("--force", action="store_true", help="Run tasks even if their inputs are unchanged")
+    parser.add_argument("--in-process", action="store_true", help="Run tasks in this interpreter instead of subprocesses")
+    parser.add_argument(
+        "--profile", nargs="?", const="all", default="",
+        help="Run tasks under cProfile + tracemalloc. Optionally only some tasks, e.g. --profile 1,3",
+    )
+    parser.add_argument("--profile-top", type=int, default=25, help="Hotspots / allocation sites to list per task")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tasks = select_tasks(args.only, args.start)
+
+    total = len(tasks)
     done = 0
 
+    started_at = datetime.now(metrics.SGT).isoformat()
+    wall_times = {}
+    skipped = {}
+    state = load_state()
+
+    profiled = parse_task_selection(args.profile) if args.profile else set()
+    profile_dir = PROFILE_DIR / datetime.now(metrics.SGT).strftime("%Y%m%d_%H%M%S")
+
     print("Progress:", render_bar(done, total))
 
-    for name, script in TASKS:
-        run_task(name, script)
+    for task in tasks:
+        digest = inputs_hash(task)
+        reason = "" if args.force else skip_reason(task, state, digest)
+        if reason:
+            print(f"\n⏭ {task['name']} (skipped: {reason})")
+            skipped[task["key"]] = reason
+        else:
+            task_profile_dir = profile_dir if task["key"] in profiled else None
+            wall_times[task["script"]] = run_task(task, args.in_process, task_profile_dir, args.profile_top)
+            state[task["key"]] = {
+                # hashed again after the run: task 2 rewrites its own input (events_previous.json)
+                "inputs_hash": inputs_hash(task),
+                "finished_at": datetime.now(metrics.SGT).isoformat(),
+            }
+            save_state(state)
         done += 1
         print("Progress:", render_bar(done, total))
 
     print("\n✅ All tasks completed.")
+    print("Run report:", write_run_report(started_at, wall_times, skipped).resolve())
+    if profiled & {t["key"] for t in tasks}:
+        print("Profiles:", profile_dir.resolve())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import metrics
+
+# ------------------------
+# Polite shared fetch scheduler for all site adapters.
+#
+# - per-host concurrency limit and minimum delay between request starts
+#   (the larger of the adapter's crawl_delay and robots.txt Crawl-delay)
+# - a global cap on open pages across all hosts
+# - callers submit everything at once (asyncio.gather); hosts interleave
+#   naturally because each host only blocks its own queue
+# - an overall run deadline and a per-page time budget (load + networkidle),
+#   so a few slow pages can't set the run time
+# ------------------------
+GLOBAL_CONCURRENCY = 6
+CRAWL_DEADLINE_SECONDS = float(os.getenv("CRAWL_DEADLINE_SECONDS", "900"))
+PAGE_BUDGET_SECONDS = float(os.getenv("CRAWL_PAGE_BUDGET_SECONDS", "30"))
+USER_AGENT = "Mozilla/5.0 (compatible; SCCCI-event-monitor)"
+
+
+class DeadlineExceeded(TimeoutError):
+    """The crawl's overall deadline passed before this page could be fetched."""
+
+
+class HostPolicy:
+    def __init__(self, host: str, max_concurrency: int, crawl_delay: float):
+        self.host = host
+        self.crawl_delay = crawl_delay
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+        self.robots = None
+        self.ready = asyncio.Event()  # set once robots.txt is loaded
+
+    async def wait_turn(self):
+        """Block until this host may receive its next request."""
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_start > now:
+                await asyncio.sleep(self.next_start - now)
+            self.next_start = time.monotonic() + self.crawl_delay
+
+
+class CrawlScheduler:
+    def __init__(self, context, global_concurrency: int = GLOBAL_CONCURRENCY, respect_robots: bool = True,
+                 deadline_seconds: float = CRAWL_DEADLINE_SECONDS, page_budget_seconds: float = PAGE_BUDGET_SECONDS):
+        self.context = context  # Playwright BrowserContext
+        self.global_semaphore = asyncio.Semaphore(global_concurrency)
+        self.respect_robots = respect_robots
+        self.hosts: dict[str, HostPolicy] = {}
+        self.deadline = time.monotonic() + deadline_seconds
+        self.page_budget = page_budget_seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the crawl deadline."""
+        return self.deadline - time.monotonic()
+
+    async def policy_for(self, url: str, adapter) -> HostPolicy:
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        policy = self.hosts.get(host)
+        if policy is not None:
+            await policy.ready.wait()
+            return policy
+
+        policy = HostPolicy(host, adapter.max_concurrency, adapter.crawl_delay)
+        self.hosts[host] = policy
+        try:
+            if self.respect_robots:
+                timeout = min(self.page_budget, self.remaining())
+                policy.robots = await load_robots(self.context, f"{parsed.scheme}://{host}/robots.txt", timeout)
+                delay = policy.robots.crawl_delay(USER_AGENT) if policy.robots else None
+                if delay:
+                    policy.crawl_delay = max(policy.crawl_delay, float(delay))
+        finally:
+            policy.ready.set()
+        return policy
+
+    async def fetch(self, url: str, adapter, kind: str = "detail") -> str:
+        """
+        Load a page with the browser and return its HTML, within the page budget.
+        If the page loaded but never went network-idle, whatever rendered by the end of the budget is used.
+        """
+        policy = await self.policy_for(url, adapter)
+        if policy.robots and not policy.robots.can_fetch(USER_AGENT, url):
+            raise PermissionError(f"Disallowed by robots.txt: {url}")
+
+        async with policy.semaphore:
+            await policy.wait_turn()
+            async with self.global_semaphore:
+                budget = min(self.page_budget, self.remaining())
+                if budget <= 0:
+                    metrics.inc("deadline_skips", kind=kind, site=adapter.name)
+                    raise DeadlineExceeded(f"Crawl deadline passed before fetching {url}")
+
+                with metrics.timer("fetch_seconds", kind=kind, site=adapter.name):
+                    page = await self.context.new_page()
+                    try:
+                        started = time.monotonic()
+                        await page.goto(url, timeout=budget * 1000)
+                        left = budget - (time.monotonic() - started)
+                        try:
+                            await page.wait_for_load_state("networkidle", timeout=max(left, 0.1) * 1000)
+                        except PlaywrightTimeoutError:
+                            metrics.inc("networkidle_timeouts", kind=kind, site=adapter.name)
+                        return await page.content()
+                    finally:
+                        await page.close()
+
+
+async def load_robots(context, robots_url: str, timeout: float):
+    """
+    Parsed robots.txt, or None if it cannot be fetched within timeout seconds (then everything is allowed).
+    Fetched through the browser context's request API, so it is bounded and sends USER_AGENT.
+    """
+    if timeout <= 0:
+        return None
+    try:
+        resp = await context.request.get(robots_url, timeout=timeout * 1000, headers={"User-Agent": USER_AGENT})
+        body = await resp.text()
+    except Exception:
+        return None
+
+    # same status handling as RobotFileParser.read()
+    parser = RobotFileParser(robots_url)
+    if resp.status in (401, 403):
+        parser.disallow_all = True
+    elif resp.status >= 400:
+        parser.allow_all = True
+    else:
+        parser.parse(body.splitlines())
+    return parser
@@ -0,0 +1,206 @@
+import re
+import json
+import base64
+import struct
+import hashlib
+from array import array
+from pathlib import Path
+
+# ------------------------
+# Near-duplicate event index (MinHash + LSH banding).
+#
+# Each event becomes a set of shingles (character 4-grams of the title,
+# word 3-grams of the description). A MinHash signature estimates Jaccard
+# similarity between two such sets; LSH buckets signature bands so a lookup
+# only compares against events sharing at least one band (sub-linear in
+# history size). Candidates are then verified on estimated similarity and
+# on the date (events on different dates are never duplicates).
+# ------------------------
+INDEX_FILE = Path("data/dedup_index.json")
+
+NUM_PERM = 128
+BANDS = 32                  # 32 bands x 4 rows: pairs above ~0.5 similarity almost always collide
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.7
+
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations() -> list[tuple[int, int]]:
+    # fixed seeds so signatures stay comparable across runs
+    perms = []
+    for i in range(NUM_PERM):
+        d = hashlib.blake2b(f"minhash-perm-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(d[:8], "little") % (_MERSENNE - 1) + 1
+        b = int.from_bytes(d[8:], "little") % _MERSENNE
+        perms.append((a, b))
+    return perms
+
+
+PERMS = _permutations()
+
+
+def normalize_text(s: str) -> str:
+    s = (s or "").lower()
+    s = re.sub(r"[^\w\s]", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def shingles(title: str, description: str) -> set[str]:
+    out = set()
+    t = normalize_text(title)
+    for i in range(max(1, len(t) - 3)):
+        out.add("t:" + t[i:i + 4])
+    words = normalize_text(description).split()
+    for i in range(max(0, len(words) - 2)):
+        out.add("d:" + " ".join(words[i:i + 3]))
+    return {s for s in out if len(s) > 2}
+
+
+def minhash(tokens: set[str]) -> array:
+    sig = array("Q", [_MAX_HASH] * NUM_PERM)
+    for tok in tokens:
+        x = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+        for i, (a, b) in enumerate(PERMS):
+            h = ((a * x + b) % _MERSENNE) & _MAX_HASH
+            if h < sig[i]:
+                sig[i] = h
+    return sig
+
+
+def similarity(a: array, b: array) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def band_keys(sig: array) -> list[str]:
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<{ROWS}Q", *chunk), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def encode_sig(sig: array) -> str:
+    return base64.b64encode(sig.tobytes()).decode("ascii")
+
+
+def decode_sig(text: str) -> array:
+    sig = array("Q")
+    sig.frombytes(base64.b64decode(text))
+    return sig
+
+
+def event_fields(event) -> dict:
+    """Fields the index uses, from an event record dict or an event_model.Event."""
+    if not isinstance(event, dict):
+        return {
+            "event_id": event.event_id,
+            "title": event.title,
+            "date_key": normalize_text(event.dates.date_range),
+            "description": event.description,
+            "site": event.source.site,
+        }
+    e = event.get("event") or {}
+    dt = e.get("datetime") or {}
+    return {
+        "event_id": event.get("event_id"),
+        "title": e.get("title", ""),
+        "date_key": normalize_text(dt.get("date_range", "")),
+        "description": event.get("description_preview", ""),
+        "site": (event.get("source") or {}).get("site", ""),
+    }
+
+
+def text_key(fields: dict) -> str:
+    """Hash of the text a signature is computed from, so unchanged events are not re-signed."""
+    text = fields["title"] + "\n" + fields["description"]
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class DedupIndex:
+    def __init__(self, path: Path = INDEX_FILE, threshold: float = DEFAULT_THRESHOLD):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.entries: dict[str, dict] = {}      # event_id -> {"sig", "title", "text", "date_key", "site"}
+        self.sigs: dict[str, array] = {}
+        self.buckets: dict[str, list[str]] = {}  # band key -> event_ids
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        if data.get("num_perm") != NUM_PERM or data.get("bands") != BANDS:
+            return  # parameters changed: rebuild from scratch
+        for eid, entry in data.get("events", {}).items():
+            self._insert(eid, decode_sig(entry["sig"]), entry)
+
+    def _insert(self, eid: str, sig: array, entry: dict):
+        if eid in self.sigs:
+            self._remove(eid)
+        self.entries[eid] = entry
+        self.sigs[eid] = sig
+        for key in band_keys(sig):
+            self.buckets.setdefault(key, []).append(eid)
+
+    def _remove(self, eid: str):
+        for key in band_keys(self.sigs.pop(eid)):
+            ids = self.buckets.get(key, [])
+            if eid in ids:
+                ids.remove(eid)
+        self.entries.pop(eid, None)
+
+    def signature(self, event) -> array:
+        f = event_fields(event)
+        return minhash(shingles(f["title"], f["description"]))
+
+    def find_duplicate(self, event, sig: array = None):
+        """Best matching indexed event (other than itself): (event_id, similarity) or None."""
+        f = event_fields(event)
+        eid = f["event_id"]
+        sig = sig if sig is not None else self.signature(event)
+        date_key = f["date_key"]
+
+        candidates = set()
+        for key in band_keys(sig):
+            candidates.update(self.buckets.get(key, ()))
+        candidates.discard(eid)
+
+        best = None
+        for cid in candidates:
+            other_date = self.entries[cid].get("date_key", "")
+            if date_key and other_date and date_key != other_date:
+                continue
+            sim = similarity(sig, self.sigs[cid])
+            if sim >= self.threshold and (best is None or sim > best[1]):
+                best = (cid, sim)
+        return best
+
+    def add(self, event, sig: array = None):
+        f = event_fields(event)
+        eid = f["event_id"]
+        if not eid:
+            return
+        text = text_key(f)
+        old = self.entries.get(eid)
+        if old and sig is None and (old.get("text"), old["date_key"], old["site"]) == (text, f["date_key"], f["site"]):
+            return  # title and description unchanged: the stored signature still holds
+        sig = sig if sig is not None else self.signature(event)
+        entry = {"sig": encode_sig(sig), "title": f["title"], "text": text, "date_key": f["date_key"], "site": f["site"]}
+        if old == entry:
+            return
+        self._insert(eid, sig, entry)
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"num_perm": NUM_PERM, "bands": BANDS, "events": self.entries}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(self.path)
+        self.dirty = False
@@ -0,0 +1,273 @@
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from dataclasses import dataclass, field
+
+from pipeline_io import load_json
+from sites.common import parse_event_datetimes
+
+# ------------------------
+# Typed view of an event record.
+#
+# On disk (and in the delta/drafts files) events stay the nested dicts built by
+# sites.common.build_event_record. Tasks that walk many events load them into
+# these slotted dataclasses instead: fixed attributes instead of .get() chains,
+# a fraction of the memory of nested dicts, and a fingerprint digest computed
+# once per event so change detection is a string comparison.
+#
+# Records are treated as read-only once loaded (the digest is cached).
+# to_dict() gives back the record it was loaded from: fields the input did not
+# have (old snapshots, legacy error records) are remembered and left out again.
+# ------------------------
+
+
+@dataclass(slots=True)
+class Source:
+    site: str = ""
+    list_url: str = ""
+    event_url: str = ""
+    scraped_at: str = None  # absent on task 1 error records
+
+
+@dataclass(slots=True)
+class EventTime:
+    date_range: str = ""
+    time_range: str = ""
+    start_at: str = None  # None: scraped before dates were parsed
+    end_at: str = None
+
+
+@dataclass(slots=True)
+class Pricing:
+    member: str = ""
+    non_member: str = ""
+
+
+@dataclass(slots=True)
+class Registration:
+    signup_link: str = ""
+    provider: str = ""
+
+
+@dataclass(slots=True)
+class Image:
+    url: str = ""
+    alt: str = ""
+    source: str = ""
+
+
+@dataclass(slots=True)
+class Event:
+    event_id: str
+    title: str = ""
+    dates: EventTime = field(default_factory=EventTime)  # record["event"]["datetime"]
+    location: str = ""
+    pricing: Pricing = field(default_factory=Pricing)
+    status: str = ""
+    registration: Registration = field(default_factory=Registration)
+    images: tuple = ()  # of Image
+    description: str = ""
+    source: Source = field(default_factory=Source)
+    error: str = None  # set on task 1 error records
+    stale: dict = None  # set when task 1 carried the record over from an earlier run
+    extra: dict = field(default_factory=dict)  # any other top-level keys, kept for the round trip
+    absent: frozenset = field(default=frozenset(), repr=False, compare=False)  # RECORD_PATHS missing from the input
+    _digest: str = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Event":
+        ev = d.get("event") or {}
+        dt = ev.get("datetime") or {}
+        pricing = ev.get("pricing") or {}
+        reg = d.get("registration") or {}
+        src = d.get("source") or {}
+        images = ((d.get("media") or {}).get("images") or {}).get("items") or []
+        return cls(
+            event_id=d.get("event_id", ""),
+            title=ev.get("title", ""),
+            dates=EventTime(dt.get("date_range", ""), dt.get("time_range", ""), dt.get("start_at"), dt.get("end_at")),
+            location=ev.get("location", ""),
+            pricing=Pricing(pricing.get("member", ""), pricing.get("non_member", "")),
+            status=ev.get("status", ""),
+            registration=Registration(reg.get("signup_link", ""), reg.get("provider", "")),
+            images=tuple(Image(i.get("url", ""), i.get("alt", ""), i.get("source", "")) for i in images),
+            description=d.get("description_preview", ""),
+            source=Source(src.get("site", ""), src.get("list_url", ""), src.get("event_url", ""), src.get("scraped_at")),
+            error=d.get("error"),
+            stale=d.get("stale"),
+            extra={k: v for k, v in d.items() if k not in RECORD_KEYS},
+            absent=absent_paths(d),
+        )
+
+    def to_dict(self) -> dict:
+        """The on-disk record (same shape as build_event_record / task 1 error records, minus absent fields)."""
+        return drop_paths(self._full_dict(), self.absent)
+
+    def _full_dict(self) -> dict:
+        source = {
+            "site": self.source.site,
+            "list_url": self.source.list_url,
+            "event_url": self.source.event_url,
+        }
+        if self.source.scraped_at is not None:
+            source["scraped_at"] = self.source.scraped_at
+        if self.is_error:
+            return {"event_id": self.event_id, **self.extra, "error": self.error, "source": source}
+
+        dt = {"date_range": self.dates.date_range, "time_range": self.dates.time_range}
+        if self.dates.start_at is not None:
+            dt["start_at"] = self.dates.start_at
+        if self.dates.end_at is not None:
+            dt["end_at"] = self.dates.end_at
+        out = {
+            "event_id": self.event_id,
+            "source": source,
+            "event": {
+                "title": self.title,
+                "datetime": dt,
+                "location": self.location,
+                "pricing": {"member": self.pricing.member, "non_member": self.pricing.non_member},
+                "status": self.status,
+            },
+            "registration": {"signup_link": self.registration.signup_link, "provider": self.registration.provider},
+            "media": {
+                "images": {
+                    "count": len(self.images),
+                    "items": [{"url": i.url, "alt": i.alt, "source": i.source} for i in self.images],
+                }
+            },
+            "description_preview": self.description,
+            **self.extra,
+        }
+        if self.stale is not None:
+            out["stale"] = self.stale
+        return out
+
+    @property
+    def is_error(self) -> bool:
+        return self.error is not None
+
+    @property
+    def image_urls(self) -> list[str]:
+        return [i.url for i in self.images if i.url]
+
+    def starts_ends(self) -> tuple[datetime, datetime]:
+        """(start, end) as SGT datetimes, None if unknown; parses the raw text for old snapshots."""
+        start_at, end_at = self.dates.start_at, self.dates.end_at
+        if start_at is None:
+            start_at, end_at = parse_event_datetimes(self.dates.date_range, self.dates.time_range)
+        return (
+            datetime.fromisoformat(start_at) if start_at else None,
+            datetime.fromisoformat(end_at) if end_at else None,
+        )
+
+    def fingerprint(self) -> dict:
+        """
+        Keep only fields that matter for emailing.
+        If any of these change, we treat it as an update.
+        """
+        return {
+            "title": self.title,
+            "date_range": self.dates.date_range,
+            "time_range": self.dates.time_range,
+            "location": self.location,
+            "member_price": self.pricing.member,
+            "non_member_price": self.pricing.non_member,
+            "status": self.status,
+            "signup_link": self.registration.signup_link,
+            "provider": self.registration.provider,
+            "image_urls": sorted(set(self.image_urls)),
+        }
+
+    @property
+    def digest(self) -> str:
+        """Hash of fingerprint(), computed once per event."""
+        if self._digest is None:
+            payload = json.dumps(self.fingerprint(), ensure_ascii=False, separators=(",", ":"))
+            self._digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+        return self._digest
+
+
+RECORD_KEYS = {"event_id", "event", "registration", "media", "description_preview", "source", "error", "stale"}
+
+# Fields of a record that from_dict fills with a default when missing.
+# (scraped_at / start_at / end_at / error / stale use None for that instead.)
+RECORD_PATHS = (
+    ("source",), ("source", "site"), ("source", "list_url"), ("source", "event_url"),
+    ("event",), ("event", "title"), ("event", "datetime"),
+    ("event", "datetime", "date_range"), ("event", "datetime", "time_range"),
+    ("event", "location"), ("event", "pricing"), ("event", "pricing", "member"),
+    ("event", "pricing", "non_member"), ("event", "status"),
+    ("registration",), ("registration", "signup_link"), ("registration", "provider"),
+    ("media",), ("media", "images"), ("media", "images", "count"), ("media", "images", "items"),
+    ("description_preview",),
+)
+
+# Records of one run share a handful of shapes; keep one frozenset per shape
+_SHAPES: dict[frozenset, frozenset] = {}
+
+
+def absent_paths(d: dict) -> frozenset:
+    missing = []
+    for path in RECORD_PATHS:
+        node = d
+        for key in path[:-1]:
+            node = node.get(key)
+            if not isinstance(node, dict):
+                break
+        else:
+            if path[-1] in node:
+                continue
+        # a missing parent already drops the whole section
+        if not any(path[:i] in missing for i in range(1, len(path))):
+            missing.append(path)
+    shape = frozenset(missing)
+    return _SHAPES.setdefault(shape, shape)
+
+
+def drop_paths(d: dict, paths: frozenset) -> dict:
+    for path in paths:
+        node = d
+        for key in path[:-1]:
+            node = node.get(key)
+            if not isinstance(node, dict):
+                break
+        else:
+            node.pop(path[-1], None)
+    return d
+
+
+def load_events(path, default=()) -> list[Event]:
+    return [Event.from_dict(d) for d in load_json(path, list(default))]
+
+
+def iter_records(doc):
+    """Event records in a snapshot (list of events) or a delta / drafts document (items embedding "event")."""
+    if isinstance(doc, dict):
+        for item in doc.get("items", []):
+            if item.get("event"):
+                yield item["event"]
+        return
+    yield from doc
+
+
+def check_round_trip(paths) -> int:
+    """Number of records in the given JSON files that from_dict/to_dict does not give back unchanged."""
+    failures = 0
+    for path in paths:
+        records = list(iter_records(load_json(path, [])))
+        bad = [r.get("event_id", "?") for r in records if Event.from_dict(r).to_dict() != r]
+        print(f"{path}: {len(records) - len(bad)}/{len(records)} records round-trip", *bad[:5])
+        failures += len(bad)
+    return failures
+
+
+if __name__ == "__main__":
+    # python source/event_model.py check [files...]
+    import sys
+    if sys.argv[1:2] == ["check"]:
+        files = sys.argv[2:] or [p for p in ("data/events_current.json", "data/events_previous.json",
+                                             "data/events_delta.json", "out/drafts.json") if Path(p).exists()]
+        sys.exit(1 if check_round_trip(files) else 0)
+    print("Usage: python source/event_model.py check [files...]")
@@ -0,0 +1,432 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import hashlib
+from datetime import datetime, timezone, timedelta
+
+from sites import site_of, event_datetimes
+
+# ------------------------
+# Paths
+# ------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', 'data')
+DB_FILE = os.path.join(DATA_DIR, 'history.db')
+
+SGT = timezone(timedelta(hours=8))
+
+MAX_PER_PAGE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id      TEXT PRIMARY KEY,
+    site          TEXT NOT NULL DEFAULT '',
+    title         TEXT NOT NULL DEFAULT '',
+    date_range    TEXT NOT NULL DEFAULT '',
+    time_range    TEXT NOT NULL DEFAULT '',
+    start_at      TEXT NOT NULL DEFAULT '',     -- SGT ISO, '' if unknown
+    end_at        TEXT NOT NULL DEFAULT '',
+    location      TEXT NOT NULL DEFAULT '',
+    status        TEXT NOT NULL DEFAULT '',
+    event_url     TEXT NOT NULL DEFAULT '',
+    signup_link   TEXT NOT NULL DEFAULT '',
+    description   TEXT NOT NULL DEFAULT '',
+    first_seen    TEXT NOT NULL,
+    last_seen     TEXT NOT NULL,
+    content_hash  TEXT NOT NULL,
+    raw           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_events_site ON events(site);
+CREATE INDEX IF NOT EXISTS ix_events_first_seen ON events(first_seen);
+
+CREATE TABLE IF NOT EXISTS drafts (
+    id                  INTEGER PRIMARY KEY,
+    event_id            TEXT NOT NULL,
+    generated_at        TEXT NOT NULL,
+    change_type         TEXT NOT NULL DEFAULT '',
+    status              TEXT NOT NULL,          -- drafted | error | sent
+    subject             TEXT NOT NULL DEFAULT '',
+    email_blurb         TEXT NOT NULL DEFAULT '',
+    whatsapp_text       TEXT NOT NULL DEFAULT '',
+    error               TEXT NOT NULL DEFAULT '',
+    email_preview_path  TEXT NOT NULL DEFAULT '',
+    sent_at             TEXT NOT NULL DEFAULT '',
+    UNIQUE (event_id, generated_at)
+);
+CREATE INDEX IF NOT EXISTS ix_drafts_event ON drafts(event_id);
+
+-- Full-text indexes, keyed by rowid so lookups and joins are direct:
+-- events_fts.rowid = events.rowid, drafts_fts.rowid = drafts.id (events are never VACUUMed)
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    title,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS drafts_fts USING fts5(
+    title,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+
+# Columns added after the first release; ALTERed into existing databases
+MIGRATIONS = {
+    "events": {
+        "start_at": "TEXT NOT NULL DEFAULT ''",
+        "end_at": "TEXT NOT NULL DEFAULT ''",
+    },
+}
+
+POST_MIGRATION = """
+CREATE INDEX IF NOT EXISTS ix_events_start_at ON events(start_at);
+"""
+
+
+def event_fts_values(row) -> tuple[str, str]:
+    body = " ".join(filter(None, [row["location"], row["date_range"], row["description"]]))
+    return row["title"], body
+
+
+def draft_fts_values(row) -> tuple[str, str]:
+    return row["subject"], row["email_blurb"] + " " + row["whatsapp_text"]
+
+
+def now_iso() -> str:
+    return datetime.now(SGT).isoformat()
+
+
+def fts_query(q: str) -> str:
+    """User text -> FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", q or "", re.UNICODE)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " AND ".join(terms)
+
+
+def event_row(e) -> dict:
+    """Indexed columns of an event record dict or an event_model.Event."""
+    if not isinstance(e, dict):
+        start, end = e.starts_ends()
+        return {
+            "event_id": e.event_id,
+            "site": site_of(e),
+            "title": e.title,
+            "date_range": e.dates.date_range,
+            "time_range": e.dates.time_range,
+            "start_at": start.isoformat() if start else "",
+            "end_at": end.isoformat() if end else "",
+            "location": e.location,
+            "status": e.status,
+            "event_url": e.source.event_url,
+            "signup_link": e.registration.signup_link,
+            "description": e.description,
+        }
+    ev = e.get("event") or {}
+    dt = ev.get("datetime") or {}
+    src = e.get("source") or {}
+    reg = e.get("registration") or {}
+    start, end = event_datetimes(e)
+    return {
+        "event_id": e.get("event_id", ""),
+        "site": site_of(e),
+        "title": ev.get("title", ""),
+        "date_range": dt.get("date_range", ""),
+        "time_range": dt.get("time_range", ""),
+        "start_at": start.isoformat() if start else "",
+        "end_at": end.isoformat() if end else "",
+        "location": ev.get("location", ""),
+        "status": ev.get("status", ""),
+        "event_url": src.get("event_url", ""),
+        "signup_link": reg.get("signup_link", ""),
+        "description": e.get("description_preview", ""),
+    }
+
+
+class HistoryStore:
+    """
+    Persistent history of every event and draft the pipeline has produced,
+    with an FTS5 index for search. Indexing is incremental: events whose
+    content did not change since the last run are not rewritten.
+    """
+
+    def __init__(self, path: str = DB_FILE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+            for table, columns in MIGRATIONS.items():
+                existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+                for name, decl in columns.items():
+                    if name not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            conn.executescript(POST_MIGRATION)
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_fts'").fetchone():
+                self._rebuild_fts(conn)
+                conn.execute("DROP TABLE search_fts")
+
+    @staticmethod
+    def _rebuild_fts(conn):
+        """Fill events_fts / drafts_fts from the tables (replaces the old ref-keyed search_fts)."""
+        conn.execute("DELETE FROM events_fts")
+        conn.execute("DELETE FROM drafts_fts")
+        conn.executemany(
+            "INSERT INTO events_fts (rowid, title, body) VALUES (?, ?, ?)",
+            ((r["rowid"], *event_fts_values(r))
+             for r in conn.execute("SELECT rowid, title, location, date_range, description FROM events")),
+        )
+        conn.executemany(
+            "INSERT INTO drafts_fts (rowid, title, body) VALUES (?, ?, ?)",
+            ((r["id"], *draft_fts_values(r))
+             for r in conn.execute("SELECT id, subject, email_blurb, whatsapp_text FROM drafts WHERE status != 'error'")),
+        )
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    # ------------------------
+    # Indexing
+    # ------------------------
+    def index_events(self, events, seen_at: str = None) -> dict:
+        """events: record dicts or event_model.Event objects."""
+        seen_at = seen_at or now_iso()
+        result = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+        with self.connect() as conn:
+            hashes = {r["event_id"]: r["content_hash"] for r in conn.execute("SELECT event_id, content_hash FROM events")}
+            for e in events:
+                if isinstance(e, dict):
+                    skip = not e.get("event_id") or "error" in e or e.get("stale")
+                else:
+                    skip = not e.event_id or e.is_error or e.stale
+                if skip:
+                    continue  # stale = carried over by task 1, not actually seen this run
+                row = event_row(e)
+                digest = hashlib.sha256(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()
+                eid = row["event_id"]
+
+                if hashes.get(eid) == digest:
+                    conn.execute("UPDATE events SET last_seen = ? WHERE event_id = ?", (seen_at, eid))
+                    result["unchanged"] += 1
+                    continue
+
+                record = e if isinstance(e, dict) else e.to_dict()
+                raw = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+                if eid in hashes:
+                    rowid = conn.execute("SELECT rowid FROM events WHERE event_id = ?", (eid,)).fetchone()[0]
+                    conn.execute(
+                        """
+                        UPDATE events SET site=:site, title=:title, date_range=:date_range, time_range=:time_range,
+                            start_at=:start_at, end_at=:end_at, location=:location, status=:status, event_url=:event_url, signup_link=:signup_link,
+                            description=:description, last_seen=:seen, content_hash=:hash, raw=:raw
+                        WHERE event_id=:event_id
+                        """,
+                        {**row, "seen": seen_at, "hash": digest, "raw": raw},
+                    )
+                    result["updated"] += 1
+                else:
+                    rowid = conn.execute(
+                        """
+                        INSERT INTO events (event_id, site, title, date_range, time_range, start_at, end_at,
+                            location, status, event_url, signup_link, description, first_seen, last_seen,
+                            content_hash, raw)
+                        VALUES (:event_id, :site, :title, :date_range, :time_range, :start_at, :end_at,
+                            :location, :status, :event_url, :signup_link, :description, :seen, :seen, :hash, :raw)
+                        """,
+                        {**row, "seen": seen_at, "hash": digest, "raw": raw},
+                    ).lastrowid
+                    result["inserted"] += 1
+                hashes[eid] = digest
+
+                conn.execute("DELETE FROM events_fts WHERE rowid = ?", (rowid,))
+                conn.execute(
+                    "INSERT INTO events_fts (rowid, title, body) VALUES (?, ?, ?)",
+                    (rowid, *event_fts_values(row)),
+                )
+        return result
+
+    def index_drafts(self, drafts: list[dict]) -> int:
+        count = 0
+        with self.connect() as conn:
+            for d in drafts:
+                if not d.get("event_id"):
+                    continue
+                draft = d.get("draft") or {}
+                values = {
+                    "event_id": d["event_id"],
+                    "generated_at": d.get("generated_at") or now_iso(),
+                    "change_type": d.get("change_type", ""),
+                    "status": "drafted" if draft else "error",
+                    "subject": draft.get("subject", ""),
+                    "email_blurb": draft.get("email_blurb", ""),
+                    "whatsapp_text": draft.get("whatsapp_text", ""),
+                    "error": d.get("error", ""),
+                    "email_preview_path": d.get("email_preview_path", ""),
+                }
+                conn.execute(
+                    """
+                    INSERT INTO drafts (event_id, generated_at, change_type, status, subject, email_blurb,
+                        whatsapp_text, error, email_preview_path)
+                    VALUES (:event_id, :generated_at, :change_type, :status, :subject, :email_blurb,
+                        :whatsapp_text, :error, :email_preview_path)
+                    ON CONFLICT(event_id, generated_at) DO UPDATE SET
+                        change_type=excluded.change_type, status=excluded.status, subject=excluded.subject,
+                        email_blurb=excluded.email_blurb, whatsapp_text=excluded.whatsapp_text,
+                        error=excluded.error, email_preview_path=excluded.email_preview_path
+                    """,
+                    values,
+                )
+                draft_id = conn.execute(
+                    "SELECT id FROM drafts WHERE event_id = ? AND generated_at = ?",
+                    (values["event_id"], values["generated_at"]),
+                ).fetchone()["id"]
+
+                conn.execute("DELETE FROM drafts_fts WHERE rowid = ?", (draft_id,))
+                if draft:
+                    conn.execute(
+                        "INSERT INTO drafts_fts (rowid, title, body) VALUES (?, ?, ?)",
+                        (draft_id, *draft_fts_values(values)),
+                    )
+                count += 1
+        return count
+
+    def mark_sent(self, event_id: str, sent_at: str = None):
+        """Mark the latest draft of an event as sent."""
+        with self.connect() as conn:
+            conn.execute(
+                """
+                UPDATE drafts SET status = 'sent', sent_at = ?
+                WHERE id = (SELECT id FROM drafts WHERE event_id = ? ORDER BY generated_at DESC LIMIT 1)
+                """,
+                (sent_at or now_iso(), event_id),
+            )
+
+    # ------------------------
+    # Search
+    # ------------------------
+    def search(self, q: str = "", kind: str = "", status: str = "", source: str = "",
+               date_from: str = "", date_to: str = "", starts_from: str = "", starts_to: str = "",
+               page: int = 1, per_page: int = 20) -> dict:
+        """
+        Ranked (bm25), paginated search over events and drafts.
+        date_from / date_to (YYYY-MM-DD) filter on first_seen for events, generated_at for drafts.
+        starts_from / starts_to (YYYY-MM-DD, SGT) filter on when the event itself starts; undated events never match.
+        status matches the event status (Open/Closed) or draft status (drafted/error/sent).
+        """
+        page = max(1, page)
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        match = fts_query(q)
+
+        selects, params = [], []
+        for k in ("event", "draft"):
+            if kind and kind != k:
+                continue
+            fts = f"{k}s_fts"
+            if k == "event":
+                sql = """
+                    SELECT 'event' AS kind, e.event_id AS ref, e.event_id, e.site, e.title,
+                        e.status, e.first_seen AS at, e.date_range, e.start_at, e.end_at, e.event_url,
+                        '' AS subject, {rank} AS rank
+                    FROM {src}
+                """
+                src = f"{fts} JOIN events e ON e.rowid = {fts}.rowid" if match else "events e"
+            else:
+                sql = """
+                    SELECT 'draft' AS kind, CAST(d.id AS TEXT) AS ref, d.event_id, e.site, e.title,
+                        d.status, d.generated_at AS at, e.date_range, e.start_at, e.end_at, e.event_url,
+                        d.subject, {rank} AS rank
+                    FROM {src}
+                    LEFT JOIN events e ON e.event_id = d.event_id
+                """
+                src = f"{fts} JOIN drafts d ON d.id = {fts}.rowid" if match else "drafts d"
+            where = []
+            if match:
+                sql = sql.format(rank=f"bm25({fts})", src=src)
+                where.append(f"{fts} MATCH ?")
+                params.append(match)
+            else:
+                sql = sql.format(rank="0", src=src)
+            alias = "e" if k == "event" else "d"
+            at_col = f"{alias}.first_seen" if k == "event" else "d.generated_at"
+            if status:
+                where.append(f"lower({alias}.status) = lower(?)")
+                params.append(status)
+            if source:
+                where.append("e.site = ?")
+                params.append(source)
+            if date_from:
+                where.append(f"substr({at_col}, 1, 10) >= ?")
+                params.append(date_from)
+            if date_to:
+                where.append(f"substr({at_col}, 1, 10) <= ?")
+                params.append(date_to)
+            if starts_from:
+                where.append("e.start_at != '' AND substr(e.start_at, 1, 10) >= ?")
+                params.append(starts_from)
+            if starts_to:
+                where.append("e.start_at != '' AND substr(e.start_at, 1, 10) <= ?")
+                params.append(starts_to)
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            selects.append(sql)
+
+        if not selects:
+            return {"page": page, "per_page": per_page, "total": 0, "items": []}
+
+        union = " UNION ALL ".join(selects)
+        with self.connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM ({union})", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM ({union}) ORDER BY rank, at DESC LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page],
+            ).fetchall()
+
+        return {"page": page, "per_page": per_page, "total": total, "items": [dict(r) for r in rows]}
+
+    def event_history(self, event_id: str) -> dict:
+        with self.connect() as conn:
+            event = conn.execute("SELECT * FROM events WHERE event_id = ?", (event_id,)).fetchone()
+            drafts = conn.execute(
+                "SELECT * FROM drafts WHERE event_id = ? ORDER BY generated_at DESC", (event_id,)
+            ).fetchall()
+        if not event and not drafts:
+            return {}
+        out = dict(event) if event else {"event_id": event_id}
+        out.pop("raw", None)
+        out["drafts"] = [dict(d) for d in drafts]
+        return out
+
+
+def backfill():
+    """Index whatever pipeline outputs exist right now (first-time setup)."""
+    from pipeline_io import iter_drafts, iter_delta, load_json
+
+    store = HistoryStore()
+    root = os.path.join(BASE_DIR, '..')
+    for name in ("events_previous.json", "events_current.json"):
+        events = load_json(os.path.join(root, 'data', name), [])
+        print(name, store.index_events(events))
+    delta_events = [i["event"] for i in iter_delta(os.path.join(root, 'data')) if i.get("event")]
+    print("delta", store.index_events(delta_events))
+    drafts = [d for d in iter_drafts(os.path.join(root, 'out')) if "event_id" in d]
+    print("drafts", store.index_drafts(drafts))
+
+    sent_path = os.path.join(root, 'out', 'sent_emails.json')
+    for eid in load_json(sent_path, []):
+        store.mark_sent(eid)
+
+
+if __name__ == "__main__":
+    # python source/history_store.py backfill
+    if sys.argv[1:] == ["backfill"]:
+        backfill()
+    else:
+        print("Usage: python source/history_store.py backfill")
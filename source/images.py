@@ -0,0 +1,193 @@
+import os
+import io
+import json
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow missing -> cache originals without resizing
+    Image = None
+
+# ------------------------
+# Config
+# ------------------------
+IMAGE_DIR = Path("out/images")
+ORIGINALS_DIR = IMAGE_DIR / "orig"
+INDEX_FILE = IMAGE_DIR / "index.json"
+
+# Email body is 680px wide with 22px padding; 2x for high-DPI screens
+EMAIL_WIDTH = int(os.getenv("IMAGE_EMAIL_WIDTH", "1200"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+FETCH_WORKERS = int(os.getenv("IMAGE_FETCH_WORKERS", "8"))
+FETCH_TIMEOUT = 20
+MAX_BYTES = 15 * 1024 * 1024
+
+# hotlink -> keep the source URL in emails (old behaviour)
+# cid     -> attach the resized image to the email (task 4) and reference it as cid:<hash>
+# serve   -> reference {IMAGE_BASE_URL}/images/<file>, served by server.py
+IMAGE_MODE = os.getenv("IMAGE_MODE", "cid").strip().lower()
+IMAGE_BASE_URL = os.getenv("IMAGE_BASE_URL", "").rstrip("/")
+
+USER_AGENT = "Mozilla/5.0 (compatible; SCCCI-event-mailer)"
+
+EXT_BY_FORMAT = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+EXT_BY_CONTENT_TYPE = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+
+def load_index() -> dict:
+    if not INDEX_FILE.exists():
+        return {"urls": {}, "variants": {}}
+    return json.loads(INDEX_FILE.read_text(encoding="utf-8"))
+
+
+def save_index(index: dict):
+    IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = INDEX_FILE.with_name(INDEX_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, INDEX_FILE)
+
+
+def fetch(session: requests.Session, url: str) -> tuple[bytes, str]:
+    resp = session.get(url, timeout=FETCH_TIMEOUT, stream=True, headers={"User-Agent": USER_AGENT})
+    resp.raise_for_status()
+    content_type = (resp.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith("image/"):
+        raise ValueError(f"Not an image ({content_type})")
+
+    buf = io.BytesIO()
+    for chunk in resp.iter_content(64 * 1024):
+        buf.write(chunk)
+        if buf.tell() > MAX_BYTES:
+            raise ValueError("Image too large")
+    return buf.getvalue(), content_type
+
+
+def make_variant(data: bytes, digest: str) -> dict:
+    """
+    Resize to EMAIL_WIDTH and recompress. Opaque images become progressive JPEG,
+    images with transparency stay PNG. Returns the variant record.
+    """
+    if Image is None:
+        return {}
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if getattr(img, "is_animated", False):
+            return {}  # keep animated GIFs as-is
+
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        if img.width > EMAIL_WIDTH:
+            height = round(img.height * EMAIL_WIDTH / img.width)
+            img = img.resize((EMAIL_WIDTH, height), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if has_alpha:
+            img.convert("RGBA").save(out, "PNG", optimize=True)
+            ext = "png"
+        else:
+            img.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            ext = "jpg"
+        width, height = img.size
+
+    name = f"{digest}_{EMAIL_WIDTH}.{ext}"
+    path = IMAGE_DIR / name
+    if not path.exists():
+        path.write_bytes(out.getvalue())
+    return {"file": name, "width": width, "height": height, "bytes": path.stat().st_size}
+
+
+def cache_image(session: requests.Session, url: str, index: dict, lock: threading.Lock) -> dict:
+    """Download one URL into the content-addressed cache and build its email variant."""
+    data, content_type = fetch(session, url)
+    digest = hashlib.sha256(data).hexdigest()[:32]
+
+    with lock:
+        known = index["variants"].get(digest)
+    if known:
+        return {"hash": digest, **known}
+
+    ext = EXT_BY_CONTENT_TYPE.get(content_type, "bin")
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(data)) as probe:
+                ext = EXT_BY_FORMAT.get(probe.format, ext)
+        except Exception:
+            pass
+
+    original = ORIGINALS_DIR / f"{digest}.{ext}"
+    if not original.exists():
+        original.write_bytes(data)
+
+    try:
+        variant = make_variant(data, digest)
+    except Exception as e:
+        print(f"[Images] Resize failed for {url}: {e}")
+        variant = {}
+    if not variant:
+        # no Pillow / animated / unreadable: serve the original file
+        variant = {"file": f"orig/{original.name}", "bytes": len(data)}
+    variant["original_bytes"] = len(data)
+
+    with lock:
+        index["variants"][digest] = variant
+    return {"hash": digest, **variant}
+
+
+def cache_images(urls) -> dict[str, dict]:
+    """
+    Download URLs concurrently (already-cached URLs are not refetched).
+    Returns {url: {"hash", "file", ...}} for every URL that could be cached.
+    """
+    IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+    ORIGINALS_DIR.mkdir(parents=True, exist_ok=True)
+
+    index = load_index()
+    lock = threading.Lock()
+    results = {}
+
+    todo = []
+    for url in dict.fromkeys(u for u in urls if u):
+        digest = index["urls"].get(url)
+        variant = index["variants"].get(digest) if digest else None
+        if variant and (IMAGE_DIR / variant["file"]).exists():
+            results[url] = {"hash": digest, **variant}
+        else:
+            todo.append(url)
+
+    if todo:
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            futures = {url: pool.submit(cache_image, session, url, index, lock) for url in todo}
+            for url, fut in futures.items():
+                try:
+                    results[url] = fut.result()
+                    index["urls"][url] = results[url]["hash"]
+                except Exception as e:
+                    print(f"[Images] Could not cache {url}: {e}")
+        save_index(index)
+
+    return results
+
+
+def event_image_urls(event: dict) -> list[str]:
+    media = event.get("media", {}) or {}
+    items = (media.get("images") or {}).get("items", [])
+    return [img.get("url") for img in items if img.get("url")]
+
+
+def email_src(cached: dict) -> str:
+    """The src an email client should see for a cached image (per IMAGE_MODE)."""
+    if IMAGE_MODE == "cid":
+        return f"cid:{cached['hash']}"
+    if IMAGE_MODE == "serve" and IMAGE_BASE_URL:
+        return f"{IMAGE_BASE_URL}/images/{cached['file']}"
+    return ""
@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+
+# ------------------------
+# Paths
+# ------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+JOBS_DIR = os.path.join(ROOT_DIR, 'out', 'jobs')
+
+SGT = timezone(timedelta(hours=8))
+
+# Jobs go through run_all_tasks.py from the project root, because every task
+# resolves data/ and out/ relative to the working directory. A full run is
+# incremental (unchanged tasks are skipped); a single-task job always runs.
+TASK_KEYS = ("task1", "task2", "task3", "task4")
+RUN_ALL_SCRIPT = "run_all_tasks.py"
+
+ACTIVE = ("queued", "running")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+# How long to wait for a job's leftover processes before killing them
+GROUP_EXIT_TIMEOUT = 10
+
+
+def now_iso() -> str:
+    return datetime.now(SGT).isoformat()
+
+
+def popen_group_kwargs() -> dict:
+    """Start a job in its own process group, so cancelling it also reaches the task it is running."""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def terminate_group(proc):
+    """Stop the runner and every process it started (it runs each task as a subprocess)."""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(proc.pid)], capture_output=True)
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def wait_group(proc, timeout: float = GROUP_EXIT_TIMEOUT):
+    """Block until no process of the job's group is left (POSIX), killing stragglers after timeout."""
+    if os.name == "nt":
+        return
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.killpg(proc.pid, 0)
+        except ProcessLookupError:
+            return
+        if time.monotonic() > deadline:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                return
+            deadline = time.monotonic() + timeout
+        time.sleep(0.1)
+
+
+class Job:
+    def __init__(self, kind: str, task: str = "", force: bool = False):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.kind = kind            # "run" | "task"
+        self.task = task            # "task1".."task4" for kind == "task"
+        self.force = force or kind == "task"  # run even tasks whose inputs are unchanged
+        self.status = "queued"
+        self.submitted_at = now_iso()
+        self.started_at = ""
+        self.finished_at = ""
+        self.duration_s = None
+        self.returncode = None
+        self.error = ""
+        self.submissions = 1        # how many requests coalesced into this job
+        self.log_path = os.path.join(JOBS_DIR, f"{self.job_id}.log")
+        self.proc = None
+        self.future = None
+        self.cancel_requested = False
+
+    @property
+    def key(self) -> str:
+        return "run" if self.kind == "run" else f"task:{self.task}"
+
+    def command(self) -> list[str]:
+        if self.kind == "run":
+            return [sys.executable, "-u", RUN_ALL_SCRIPT] + (["--force"] if self.force else [])
+        return [sys.executable, "-u", RUN_ALL_SCRIPT, "--only", self.task, "--force"]
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "task": self.task,
+            "force": self.force,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_s": self.duration_s,
+            "returncode": self.returncode,
+            "error": self.error,
+            "submissions": self.submissions,
+            "log_path": os.path.relpath(self.log_path, ROOT_DIR),
+        }
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a small worker pool inside the server process.
+
+    - Submitting a job that is already queued/running returns that job instead
+      of starting another one. A full run absorbs single task submissions only
+      while it is still queued and forced: an incremental run may skip the task
+      as unchanged, and a running one may be past it. Otherwise the task job
+      queues behind the run.
+    - Jobs share data/ and out/ files, so only one job executes at a time;
+      the pool just keeps the HTTP handlers from blocking.
+    """
+
+    def __init__(self, max_workers: int = 2, history: int = 50):
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.history = history
+        self.jobs: dict[str, Job] = {}
+        self.lock = threading.Lock()
+        self.pipeline_lock = threading.Lock()
+
+    # ------------------------
+    # Public API
+    # ------------------------
+    def submit(self, kind: str, task: str = "", force: bool = False) -> tuple[Job, bool]:
+        """Return (job, created). created is False when coalesced into an active job."""
+        if kind not in ("run", "task"):
+            raise ValueError(f"Unknown job kind: {kind}")
+        if kind == "task" and task not in TASK_KEYS:
+            raise ValueError(f"Unknown task: {task}")
+
+        with self.lock:
+            job = Job(kind, task, force)
+            existing = self._find_active(job)
+            if existing:
+                existing.submissions += 1
+                return existing, False
+
+            self.jobs[job.job_id] = job
+            self._prune()
+            job.future = self.executor.submit(self._run, job)
+            return job, True
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> list[dict]:
+        with self.lock:
+            jobs = sorted(self.jobs.values(), key=lambda j: j.submitted_at, reverse=True)
+            return [j.to_dict() for j in jobs]
+
+    def cancel(self, job_id: str):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            if job.status == "queued" and job.future and job.future.cancel():
+                self._finish(job, "cancelled")
+                return job
+            proc = job.proc
+
+        if proc:
+            terminate_group(proc)
+        return job
+
+    def read_log(self, job_id: str, tail: int = 0) -> str:
+        job = self.get(job_id)
+        if not job or not os.path.exists(job.log_path):
+            return ""
+        with open(job.log_path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+        if tail > 0:
+            lines = lines[-tail:]
+        return "".join(lines)
+
+    # ------------------------
+    # Internals
+    # ------------------------
+    def _find_active(self, new: Job):
+        """An active job that does everything `new` asks for, if any."""
+        for job in self.jobs.values():
+            if job.status not in ACTIVE:
+                continue
+            if new.kind == "run":
+                if job.kind == "run" and (job.force or not new.force):
+                    return job
+            elif job.kind == "run":
+                if job.status == "queued" and job.force:
+                    return job
+            elif job.task == new.task:
+                return job
+        return None
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.status in FINISHED]
+        finished.sort(key=lambda j: j.submitted_at)
+        for job in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job.job_id]
+
+    def _finish(self, job: Job, status: str, error: str = ""):
+        job.status = status
+        job.error = error
+        job.finished_at = now_iso()
+        if job.started_at:
+            started = datetime.fromisoformat(job.started_at)
+            job.duration_s = round((datetime.fromisoformat(job.finished_at) - started).total_seconds(), 3)
+        self._write_meta(job)
+
+    def _write_meta(self, job: Job):
+        meta_path = os.path.join(JOBS_DIR, f"{job.job_id}.json")
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f, indent=2)
+
+    def _run(self, job: Job):
+        with self.pipeline_lock:
+            with self.lock:
+                if job.cancel_requested:
+                    self._finish(job, "cancelled")
+                    return
+                job.status = "running"
+                job.started_at = now_iso()
+
+            env = dict(os.environ, PYTHONIOENCODING="utf-8")
+            try:
+                with open(job.log_path, 'w', encoding='utf-8') as log:
+                    log.write(f"[{job.started_at}] $ {' '.join(job.command())}\n")
+                    log.flush()
+                    proc = subprocess.Popen(
+                        job.command(),
+                        cwd=ROOT_DIR,
+                        env=env,
+                        stdout=log,
+                        stderr=subprocess.STDOUT,
+                        **popen_group_kwargs(),
+                    )
+                    with self.lock:
+                        job.proc = proc
+                        # a cancel that came in before job.proc was set
+                        cancelled = job.cancel_requested
+                    if cancelled:
+                        terminate_group(proc)
+                    returncode = proc.wait()
+                    # the pipeline lock is only released once nothing of this job touches data/ any more
+                    wait_group(proc)
+                    log.write(f"[{now_iso()}] exit code {returncode}\n")
+            except Exception as e:
+                with self.lock:
+                    job.proc = None
+                    self._finish(job, "failed", str(e))
+                return
+
+            with self.lock:
+                job.proc = None
+                job.returncode = returncode
+                if job.cancel_requested:
+                    self._finish(job, "cancelled")
+                elif returncode == 0:
+                    self._finish(job, "succeeded")
+                else:
+                    self._finish(job, "failed", f"Exited with code {returncode}")
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+
+# ------------------------
+# Shared instrumentation for the four tasks.
+#
+#   with metrics.timer("fetch_seconds", kind="detail"):
+#       ...
+#   metrics.inc("events_scraped")
+#   metrics.observe("llm_tokens", 512, kind="prompt")
+#   metrics.write_report("task1")
+#
+# Each task writes out/metrics/<task>.json (latest run) and appends it to
+# out/metrics/history.jsonl; server.py renders the latest reports at /metrics.
+# ------------------------
+METRICS_DIR = Path(os.getenv("METRICS_DIR", "out/metrics"))
+HISTORY_FILE = "history.jsonl"
+PREFIX = "pipeline_"
+
+SGT = timezone(timedelta(hours=8))
+
+# Latency buckets in seconds (page loads and LLM calls can take tens of seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                self.counts[i] += 1
+                break
+
+    def to_dict(self) -> dict:
+        cumulative, running = {}, 0
+        for b, c in zip(self.buckets, self.counts):
+            running += c
+            cumulative[str(b)] = running
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0,
+            "min": self.min,
+            "max": self.max,
+            "buckets": cumulative,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a fresh report (used when several tasks run in one process)."""
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.histograms: dict[str, dict[tuple, Histogram]] = {}
+        self.samples: dict[str, list[dict]] = {}
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(SGT).isoformat()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            key = label_key(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def record(self, name: str, **fields):
+        """Keep one raw sample (e.g. per-URL timings); JSON report only, not exported to /metrics."""
+        with self.lock:
+            self.samples.setdefault(name, []).append(fields)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def report(self, task: str) -> dict:
+        with self.lock:
+            return {
+                "task": task,
+                "started_at": self.started_at,
+                "finished_at": datetime.now(SGT).isoformat(),
+                "duration_s": round(time.perf_counter() - self.started, 3),
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for name, series in sorted(self.counters.items())
+                    for key, value in series.items()
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(key), **h.to_dict()}
+                    for name, series in sorted(self.histograms.items())
+                    for key, h in series.items()
+                ],
+                "samples": {name: list(rows) for name, rows in self.samples.items()},
+            }
+
+    def write_report(self, task: str, metrics_dir: Path = None) -> Path:
+        metrics_dir = Path(metrics_dir or METRICS_DIR)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        rep = self.report(task)
+
+        path = metrics_dir / f"{task}.json"
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(rep, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+        with (metrics_dir / HISTORY_FILE).open("a", encoding="utf-8") as f:
+            f.write(json.dumps(rep, ensure_ascii=False, separators=(",", ":")) + "\n")
+        return path
+
+
+# Process-wide default registry
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+record = REGISTRY.record
+reset = REGISTRY.reset
+timer = REGISTRY.timer
+write_report = REGISTRY.write_report
+
+
+# ------------------------
+# Reading reports back (server / runner)
+# ------------------------
+def load_reports(metrics_dir: Path = None) -> list[dict]:
+    """Latest report of every task, sorted by task name."""
+    metrics_dir = Path(metrics_dir or METRICS_DIR)
+    if not metrics_dir.exists():
+        return []
+    reports = []
+    for path in sorted(metrics_dir.glob("*.json")):
+        if path.name == "run_report.json":
+            continue
+        try:
+            reports.append(json.loads(path.read_text(encoding="utf-8")))
+        except ValueError:
+            continue
+    return reports
+
+
+def _labels(labels: dict, extra: dict = None) -> str:
+    merged = {**labels, **(extra or {})}
+    if not merged:
+        return ""
+    parts = []
+    for k, v in merged.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus(reports: list[dict]) -> str:
+    """Prometheus text exposition format (0.0.4) for a list of task reports."""
+    # samples of one metric family must be contiguous, so group before writing
+    families: dict[str, tuple[str, list[str]]] = {}
+
+    def family(name, kind) -> list[str]:
+        return families.setdefault(name, (kind, []))[1]
+
+    for rep in reports:
+        task = {"task": rep.get("task", "")}
+        name = PREFIX + "task_duration_seconds"
+        family(name, "gauge").append(f"{name}{_labels(task)} {rep.get('duration_s', 0)}")
+
+        finished = rep.get("finished_at")
+        if finished:
+            name = PREFIX + "task_last_run_timestamp_seconds"
+            ts = datetime.fromisoformat(finished).timestamp()
+            family(name, "gauge").append(f"{name}{_labels(task)} {ts:.3f}")
+
+        for c in rep.get("counters", []):
+            name = PREFIX + c["name"] + "_total"
+            family(name, "counter").append(f"{name}{_labels(task, c['labels'])} {c['value']}")
+
+        for h in rep.get("histograms", []):
+            name = PREFIX + h["name"]
+            base = {**task, **h["labels"]}
+            out = family(name, "histogram")
+            for le, count in h["buckets"].items():
+                out.append(f"{name}_bucket{_labels(base, {'le': le})} {count}")
+            out.append(f"{name}_bucket{_labels(base, {'le': '+Inf'})} {h['count']}")
+            out.append(f"{name}_sum{_labels(base)} {h['sum']}")
+            out.append(f"{name}_count{_labels(base)} {h['count']}")
+
+    lines = []
+    for name, (kind, samples) in families.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
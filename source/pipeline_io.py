@@ -0,0 +1,327 @@
+import os
+import sys
+import gzip
+import json
+import time
+from pathlib import Path
+
+try:
+    import pydantic_core  # Rust JSON codec, installed with pydantic
+except ImportError:
+    pydantic_core = None
+
+# ------------------------
+# Output format
+# ------------------------
+# OUTPUT_FORMAT=json   -> current files (events_delta.json / drafts.json, full events embedded)
+# OUTPUT_FORMAT=jsonl  -> normalized, newline-delimited files:
+#     data/events.jsonl        one event per line, stored once, keyed by event_id
+#     data/events_delta.jsonl  delta items referencing event_id + a {"summary": ...} line
+#     out/drafts.jsonl         draft items referencing event_id + a {"summary": ...} line
+# OUTPUT_COMPACT=1 -> no indentation / minimal separators for the JSON files
+# OUTPUT_GZIP=1    -> write the .jsonl files gzip-compressed (.jsonl.gz)
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "json").strip().lower()
+OUTPUT_COMPACT = os.getenv("OUTPUT_COMPACT", "").strip().lower() in ("1", "true", "yes")
+OUTPUT_GZIP = os.getenv("OUTPUT_GZIP", "").strip().lower() in ("1", "true", "yes")
+
+DATA_DIR = Path("data")
+OUT_DIR = Path("out")
+
+DELTA_JSON = "events_delta.json"
+DELTA_JSONL = "events_delta.jsonl"
+EVENTS_JSONL = "events.jsonl"
+DRAFTS_JSON = "drafts.json"
+DRAFTS_JSONL = "drafts.jsonl"
+# Sidecar task 3 appends to as each draft finishes; compacted into drafts.json(l) at the end
+DRAFTS_PARTIAL = "drafts.partial.jsonl"
+# A sidecar untouched for this long was left behind by a crashed run (task 3 appends after every draft)
+PARTIAL_STALE_SECONDS = int(os.getenv("PARTIAL_STALE_SECONDS", "900"))
+
+
+def is_normalized() -> bool:
+    return OUTPUT_FORMAT == "jsonl"
+
+
+# JSON encode/decode goes through pydantic_core when it is available (several times
+# faster than the json module on large snapshots); the output is the same JSON either way.
+def loads(text):
+    if pydantic_core is not None:
+        return pydantic_core.from_json(text)
+    return json.loads(text)
+
+
+def dumps(obj) -> str:
+    if pydantic_core is not None:
+        return pydantic_core.to_json(obj, indent=None if OUTPUT_COMPACT else 2).decode("utf-8")
+    if OUTPUT_COMPACT:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+def dumps_line(obj) -> str:
+    if pydantic_core is not None:
+        return pydantic_core.to_json(obj).decode("utf-8") + "\n"
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+# ------------------------
+# Plain JSON documents
+# ------------------------
+def load_json(path: Path, default):
+    path = Path(path)
+    if not path.exists():
+        return default
+    return loads(path.read_bytes())
+
+
+def write_json(path: Path, obj):
+    Path(path).write_text(dumps(obj), encoding="utf-8")
+
+
+# ------------------------
+# Newline-delimited JSON
+# ------------------------
+def jsonl_path(path: Path) -> Path:
+    """Return the existing variant of a .jsonl path (plain or .gz), preferring the configured one."""
+    path = Path(path)
+    gz = path.with_name(path.name + ".gz")
+    candidates = (gz, path) if OUTPUT_GZIP else (path, gz)
+    for p in candidates:
+        if p.exists():
+            return p
+    return candidates[0]
+
+
+def open_jsonl(path: Path, mode: str = "r"):
+    path = Path(path)
+    if path.name.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+def write_jsonl(path: Path, records) -> Path:
+    """Write records one per line (atomically replaces the file). Returns the path written."""
+    path = Path(path)
+    if OUTPUT_GZIP:
+        path = path.with_name(path.name + ".gz")
+    tmp = path.with_name(path.name + ".tmp")
+    with open_jsonl(tmp, "w") as f:
+        for rec in records:
+            f.write(dumps_line(rec))
+    os.replace(tmp, path)
+    return path
+
+
+def iter_jsonl(path: Path):
+    path = jsonl_path(path)
+    if not path.exists():
+        return
+    with open_jsonl(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield loads(line)
+
+
+def load_events_index(data_dir: Path = DATA_DIR) -> dict[str, dict]:
+    return {e["event_id"]: e for e in iter_jsonl(Path(data_dir) / EVENTS_JSONL) if e.get("event_id")}
+
+
+# ------------------------
+# Delta (task 2 -> task 3)
+# ------------------------
+def draft_event_ids(out_dir: Path = OUT_DIR) -> set[str]:
+    """event_ids the drafts on disk (final and in-progress) point at."""
+    ids = {rec["event_id"] for rec in iter_drafts(out_dir) if rec.get("event_id")}
+    return ids | set(load_partial_drafts(out_dir))
+
+
+def write_delta(summary: dict, items: list[dict], data_dir: Path = DATA_DIR, out_dir: Path = OUT_DIR):
+    """
+    items carry the full event under "event"; normalized mode stores it once in events.jsonl.
+    events.jsonl is upserted: events the current drafts still reference are kept.
+    """
+    data_dir = Path(data_dir)
+    if not is_normalized():
+        write_json(data_dir / DELTA_JSON, {"summary": summary, "items": items})
+        return data_dir / DELTA_JSON
+
+    referenced = draft_event_ids(out_dir)
+    events = {eid: e for eid, e in load_events_index(data_dir).items() if eid in referenced}
+    refs = []
+    for item in items:
+        ref = {k: v for k, v in item.items() if k != "event"}
+        event = item.get("event")
+        if event:
+            events[item["event_id"]] = event
+        refs.append(ref)
+
+    write_jsonl(data_dir / EVENTS_JSONL, events.values())
+    return write_jsonl(data_dir / DELTA_JSONL, [{"summary": summary}] + refs)
+
+
+def iter_delta(data_dir: Path = DATA_DIR, with_events: bool = True):
+    """
+    Yield delta records item by item, whichever format is on disk.
+    Items get their "event" resolved; the summary is yielded as {"summary": ...}.
+    """
+    data_dir = Path(data_dir)
+    path = jsonl_path(data_dir / DELTA_JSONL)
+    if is_normalized() or not (data_dir / DELTA_JSON).exists():
+        if path.exists():
+            events = load_events_index(data_dir) if with_events else {}
+            for rec in iter_jsonl(path):
+                if "event_id" in rec and with_events:
+                    rec["event"] = events.get(rec["event_id"], {})
+                yield rec
+            return
+
+    doc = load_json(data_dir / DELTA_JSON, {})
+    if "summary" in doc:
+        yield {"summary": doc["summary"]}
+    yield from doc.get("items", [])
+
+
+# ------------------------
+# Drafts (task 3 -> task 4 / frontend)
+# ------------------------
+def write_drafts(summary: dict, items: list[dict], out_dir: Path = OUT_DIR):
+    out_dir = Path(out_dir)
+    if not is_normalized():
+        write_json(out_dir / DRAFTS_JSON, {"summary": summary, "items": items})
+        return out_dir / DRAFTS_JSON
+
+    refs = [{k: v for k, v in item.items() if k != "event"} for item in items]
+    return write_jsonl(out_dir / DRAFTS_JSONL, refs + [{"summary": summary}])
+
+
+def append_partial_draft(record: dict, out_dir: Path = OUT_DIR):
+    """Durably append one finished draft to the sidecar (flushed + fsynced before returning)."""
+    path = Path(out_dir) / DRAFTS_PARTIAL
+    with path.open("a", encoding="utf-8") as f:
+        f.write(dumps_line(record))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_partial_drafts(out_dir: Path = OUT_DIR):
+    """
+    (drafts by event_id, sidecar mtime), or None if there is no sidecar (task 3 may remove it at any moment).
+    Last record per event wins; a torn last line is ignored.
+    """
+    path = Path(out_dir) / DRAFTS_PARTIAL
+    out = {}
+    try:
+        with path.open(encoding="utf-8") as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            for line in f:
+                try:
+                    rec = loads(line)
+                except ValueError:
+                    continue
+                if rec.get("event_id"):
+                    out[rec["event_id"]] = rec
+    except FileNotFoundError:
+        return None
+    return out, mtime
+
+
+def load_partial_drafts(out_dir: Path = OUT_DIR) -> dict[str, dict]:
+    """Drafts from an interrupted run, by event_id."""
+    found = read_partial_drafts(out_dir)
+    return found[0] if found else {}
+
+
+def touch_partial_drafts(out_dir: Path = OUT_DIR):
+    """Mark a sidecar left by an interrupted run as live again (task 3 is resuming it)."""
+    path = Path(out_dir) / DRAFTS_PARTIAL
+    if path.exists():
+        path.touch()
+
+
+def clear_partial_drafts(out_dir: Path = OUT_DIR):
+    path = Path(out_dir) / DRAFTS_PARTIAL
+    if path.exists():
+        path.unlink()
+
+
+def iter_drafts(out_dir: Path = OUT_DIR, data_dir: Path = DATA_DIR, with_events: bool = False,
+                include_partial: bool = False):
+    """
+    Yield draft records item by item (and {"summary": ...}), whichever format is on disk.
+    include_partial: while task 3 is still running, stream the drafts finished so far instead.
+    A stale sidecar (crashed run) is still streamed, but flagged interrupted rather than in progress.
+    """
+    out_dir = Path(out_dir)
+    found = read_partial_drafts(out_dir) if include_partial else None
+    if found:
+        partial, mtime = found
+        stale = time.time() - mtime > PARTIAL_STALE_SECONDS
+        events = load_events_index(data_dir) if with_events else {}
+        summary = {"in_progress": not stale, "drafted": sum(1 for r in partial.values() if "draft" in r)}
+        if stale:
+            summary["interrupted"] = True
+        yield {"summary": summary}
+        for rec in partial.values():
+            rec.pop("input_key", None)
+            if with_events:
+                rec.setdefault("event", events.get(rec["event_id"], {}))
+            yield rec
+        return
+
+    path = jsonl_path(out_dir / DRAFTS_JSONL)
+    if is_normalized() or not (out_dir / DRAFTS_JSON).exists():
+        if path.exists():
+            events = load_events_index(data_dir) if with_events else {}
+            for rec in iter_jsonl(path):
+                if "event_id" in rec and with_events:
+                    rec.setdefault("event", events.get(rec["event_id"], {}))
+                yield rec
+            return
+
+    doc = load_json(out_dir / DRAFTS_JSON, {})
+    if "summary" in doc:
+        yield {"summary": doc["summary"]}
+    yield from doc.get("items", [])
+
+
+def split_summary(records) -> tuple[dict, list[dict]]:
+    summary, items = {}, []
+    for rec in records:
+        if "summary" in rec and "event_id" not in rec:
+            summary = rec["summary"]
+        else:
+            items.append(rec)
+    return summary, items
+
+
+# ------------------------
+# Export back to the current schema
+# ------------------------
+def export_legacy(data_dir: Path = DATA_DIR, out_dir: Path = OUT_DIR):
+    """Write events_delta.json / drafts.json (full events embedded) from the normalized files."""
+    data_dir, out_dir = Path(data_dir), Path(out_dir)
+    written = []
+
+    if jsonl_path(data_dir / DELTA_JSONL).exists():
+        summary, items = split_summary(iter_delta(data_dir))
+        write_json(data_dir / DELTA_JSON, {"summary": summary, "items": items})
+        written.append(data_dir / DELTA_JSON)
+
+    if jsonl_path(out_dir / DRAFTS_JSONL).exists():
+        summary, items = split_summary(iter_drafts(out_dir, data_dir, with_events=True))
+        write_json(out_dir / DRAFTS_JSON, {"summary": summary, "items": items})
+        written.append(out_dir / DRAFTS_JSON)
+
+    return written
+
+
+if __name__ == "__main__":
+    # python source/pipeline_io.py export
+    if sys.argv[1:] == ["export"]:
+        # read the normalized files even if OUTPUT_FORMAT is not set
+        OUTPUT_FORMAT = "jsonl"
+        for p in export_legacy():
+            print("Exported:", p.resolve())
+    else:
+        print("Usage: python source/pipeline_io.py export")
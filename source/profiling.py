@@ -0,0 +1,131 @@
+import io
+import os
+import sys
+import json
+import time
+import runpy
+import pstats
+import cProfile
+import tracemalloc
+from pathlib import Path
+
+# ------------------------
+# Run one task script under cProfile + tracemalloc.
+#
+#   python source/profiling.py <script> <out_dir> [top_n]
+#
+# Writes into <out_dir>:
+#   <task>.pstats        raw cProfile data (snakeviz / pstats)
+#   <task>_hotspots.txt  top-N functions by cumulative and by own time
+#   <task>_memory.txt    peak traced memory + top-N allocation sites at peak
+#   <task>_summary.json  one-line summary numbers (read by run_all_tasks.py)
+# ------------------------
+DEFAULT_TOP = 25
+MEMORY_FRAMES = 10
+
+
+def top_functions(stats: pstats.Stats, sort: str, top: int) -> str:
+    buf = io.StringIO()
+    stats.stream = buf
+    stats.sort_stats(sort).print_stats(top)
+    return buf.getvalue()
+
+
+def hottest(stats: pstats.Stats) -> dict:
+    """The function with the most own (tottime) time."""
+    best = None
+    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        if best is None or tt > best["tottime_s"]:
+            best = {
+                "function": func,
+                "location": f"{os.path.basename(filename)}:{line}",
+                "tottime_s": round(tt, 3),
+                "cumtime_s": round(ct, 3),
+            }
+    return best or {}
+
+
+def profile_script(script: str, out_dir: Path, top: int = DEFAULT_TOP) -> dict:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    task = Path(script).stem.split("_")[0]
+
+    # behave like `python <script>`: its folder first on sys.path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    sys.argv = [script]
+
+    exit_code = 0
+    profiler = cProfile.Profile()
+    tracemalloc.start(MEMORY_FRAMES)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    profiler.enable()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        pstats_path = out_dir / f"{task}.pstats"
+        profiler.dump_stats(str(pstats_path))
+        stats = pstats.Stats(profiler)
+
+        (out_dir / f"{task}_hotspots.txt").write_text(
+            f"# {script}: top {top} by cumulative time\n"
+            + top_functions(stats, "cumulative", top)
+            + f"\n# {script}: top {top} by own time\n"
+            + top_functions(stats, "tottime", top),
+            encoding="utf-8",
+        )
+
+        # Allocation sites still live at the end; peak is the high-water mark
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        lines = [f"# {script}: peak traced memory {peak / 1024 / 1024:.1f} MB", f"# top {top} live allocation sites"]
+        for s in snapshot.statistics("lineno")[:top]:
+            lines.append(str(s))
+        (out_dir / f"{task}_memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        summary = {
+            "task": task,
+            "script": script,
+            "exit_code": exit_code,
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "peak_mb": round(peak / 1024 / 1024, 1),
+            "hottest": hottest(stats),
+            "pstats": str(pstats_path),
+        }
+        (out_dir / f"{task}_summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+    return summary
+
+
+def summary_line(summary: dict) -> str:
+    hot = summary.get("hottest") or {}
+    hot_txt = f", hottest {hot['function']} ({hot['location']}, {hot['tottime_s']}s own)" if hot else ""
+    return (
+        f"{summary['task']}: {summary['wall_s']}s wall, {summary['cpu_s']}s CPU, "
+        f"peak {summary['peak_mb']} MB{hot_txt}"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python source/profiling.py <script> <out_dir> [top_n]")
+        sys.exit(2)
+    script, out_dir = sys.argv[1], sys.argv[2]
+    top = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_TOP
+    result = profile_script(script, Path(out_dir), top)
+    sys.exit(result["exit_code"])
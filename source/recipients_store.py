@@ -0,0 +1,411 @@
+import os
+import io
+import re
+import csv
+import json
+import sqlite3
+from datetime import datetime, timezone, timedelta
+
+# ------------------------
+# Paths
+# ------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUT_DIR = os.path.join(BASE_DIR, '..', 'out')
+DB_FILE = os.path.join(OUT_DIR, 'recipients.db')
+
+# Legacy flat list ({"emails": [...]}); imported once into an empty store
+LEGACY_JSON = os.path.join(OUT_DIR, 'recipients.json')
+
+SGT = timezone(timedelta(hours=8))
+
+# Same rule as isValidEmail() in frontend/email_list.html
+EMAIL_RE = re.compile(r"^[^\s@]+@[^\s@]+\.[^\s@]+$")
+
+BATCH_SIZE = 1000
+MAX_PER_PAGE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipients (
+    id          INTEGER PRIMARY KEY,
+    email       TEXT NOT NULL,
+    email_norm  TEXT NOT NULL,
+    name        TEXT NOT NULL DEFAULT '',
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_recipients_email_norm ON recipients(email_norm);
+
+CREATE TABLE IF NOT EXISTS recipient_tags (
+    tag           TEXT NOT NULL,
+    recipient_id  INTEGER NOT NULL REFERENCES recipients(id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, recipient_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_recipient_tags_recipient ON recipient_tags(recipient_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT NOT NULL
+);
+"""
+
+
+def now_iso() -> str:
+    return datetime.now(SGT).isoformat()
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def is_valid_email(email: str) -> bool:
+    return bool(EMAIL_RE.match((email or "").strip()))
+
+
+def normalize_tags(tags) -> list[str]:
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = re.split(r"[;,|]", tags)
+    out = []
+    for t in tags:
+        t = str(t).strip().lower()
+        if t and t not in out:
+            out.append(t)
+    return out
+
+
+def normalize_tag(tag) -> str:
+    """One segment tag as stored; "" (no filter) for a blank one."""
+    tags = normalize_tags([tag] if tag else [])
+    return tags[0] if tags else ""
+
+
+def chunked(rows, size: int = BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class RecipientStore:
+    """
+    SQLite-backed recipient directory.
+
+    Addresses are unique on their normalized (trimmed, lower-cased) form.
+    Segments are plain tags; a recipient can carry any number of them.
+    """
+
+    def __init__(self, path: str = DB_FILE, legacy_json: str = LEGACY_JSON):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+        self._import_legacy(legacy_json)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _import_legacy(self, legacy_json: str):
+        """
+        Seed the store from recipients.json exactly once. Nothing writes that file any more,
+        so an emptied store must stay empty rather than being reseeded with old addresses.
+        """
+        with self.connect() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return
+            # stores created before the flag existed were seeded when they were first opened
+            seeded = conn.execute("SELECT 1 FROM recipients LIMIT 1").fetchone()
+            if not seeded and legacy_json and os.path.exists(legacy_json):
+                with open(legacy_json, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._upsert(conn, ({"email": e} for e in data.get("emails", [])))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (now_iso(),))
+
+    # ------------------------
+    # Bulk import / export
+    # ------------------------
+    def import_rows(self, rows, tags=None) -> dict:
+        """
+        Upsert an iterable of {"email", "name"?, "tags"?} dicts in batches.
+        Invalid addresses are counted and sampled, never raised.
+        """
+        with self.connect() as conn:
+            return self._upsert(conn, rows, tags)
+
+    def _upsert(self, conn, rows, tags=None) -> dict:
+        extra_tags = normalize_tags(tags)
+        result = {"read": 0, "inserted": 0, "updated": 0, "invalid": 0, "invalid_samples": []}
+
+        for batch in chunked(rows):
+            valid = {}
+            for row in batch:
+                result["read"] += 1
+                email = (row.get("email") or "").strip()
+                if not is_valid_email(email):
+                    result["invalid"] += 1
+                    if len(result["invalid_samples"]) < 20:
+                        result["invalid_samples"].append(email)
+                    continue
+                norm = normalize_email(email)
+                # last row wins inside a batch, tags accumulate
+                prev = valid.get(norm)
+                row_tags = normalize_tags(row.get("tags")) + extra_tags
+                if prev:
+                    row_tags = prev["tags"] + [t for t in row_tags if t not in prev["tags"]]
+                name = (row.get("name") or "").strip() or (prev["name"] if prev else "")
+                valid[norm] = {"email": email, "name": name, "tags": row_tags}
+
+            if not valid:
+                continue
+
+            norms = list(valid)
+            existing = self._ids_for(conn, norms)
+            ts = now_iso()
+            conn.executemany(
+                """
+                INSERT INTO recipients (email, email_norm, name, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(email_norm) DO UPDATE SET
+                    name = CASE WHEN excluded.name != '' THEN excluded.name ELSE recipients.name END,
+                    updated_at = excluded.updated_at
+                """,
+                [(v["email"], n, v["name"], ts, ts) for n, v in valid.items()],
+            )
+            result["updated"] += len(existing)
+            result["inserted"] += len(valid) - len(existing)
+
+            ids = self._ids_for(conn, norms)
+            conn.executemany(
+                "INSERT OR IGNORE INTO recipient_tags (tag, recipient_id) VALUES (?, ?)",
+                [(t, ids[n]) for n, v in valid.items() for t in v["tags"]],
+            )
+        return result
+
+    @staticmethod
+    def _ids_for(conn, norms: list[str]) -> dict[str, int]:
+        out = {}
+        # stay well below SQLite's host-parameter limit
+        for i in range(0, len(norms), 500):
+            part = norms[i:i + 500]
+            q = f"SELECT id, email_norm FROM recipients WHERE email_norm IN ({','.join('?' * len(part))})"
+            for r in conn.execute(q, part):
+                out[r["email_norm"]] = r["id"]
+        return out
+
+    def import_csv(self, stream, tags=None) -> dict:
+        """
+        Stream a CSV file (text or binary). Uses the header row when it has an
+        "email" column, otherwise treats the first column as the address.
+        """
+        if not isinstance(stream, io.TextIOBase):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.reader(stream)
+        first = next(reader, None)
+        if first is None:
+            return self.import_rows([], tags)
+
+        header = [h.strip().lower() for h in first]
+        if "email" in header:
+            cols = {name: header.index(name) for name in ("email", "name", "tags") if name in header}
+            rows = reader
+        else:
+            cols = {"email": 0}
+            rows = _prepend(first, reader)
+
+        def gen():
+            for r in rows:
+                yield {k: (r[i] if i < len(r) else "") for k, i in cols.items()}
+
+        return self.import_rows(gen(), tags)
+
+    def import_jsonl(self, stream, tags=None) -> dict:
+        """Stream newline-delimited JSON objects, or bare JSON strings, one per line."""
+        def gen():
+            for line in stream:
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    obj = {"email": line}
+                yield obj if isinstance(obj, dict) else {"email": str(obj)}
+
+        return self.import_rows(gen(), tags)
+
+    def iter_recipients(self, tag: str = ""):
+        """Yield recipients in id order without loading the table into memory."""
+        last_id = 0
+        with self.connect() as conn:
+            while True:
+                batch = self._page_after(conn, last_id, BATCH_SIZE, tag)
+                if not batch:
+                    return
+                yield from batch
+                last_id = batch[-1]["id"]
+
+    def export_csv(self, tag: str = ""):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(["email", "name", "tags"])
+        for r in self.iter_recipients(tag):
+            writer.writerow([r["email"], r["name"], ";".join(r["tags"])])
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    def export_jsonl(self, tag: str = ""):
+        for r in self.iter_recipients(tag):
+            yield json.dumps(r, ensure_ascii=False) + "\n"
+
+    def emails(self, tag: str = "") -> list[str]:
+        return [r["email"] for r in self.iter_recipients(tag)]
+
+    # ------------------------
+    # Paginated listing / editing
+    # ------------------------
+    def _page_after(self, conn, last_id: int, limit: int, tag: str = "") -> list[dict]:
+        tag = normalize_tag(tag)
+        if tag:
+            rows = conn.execute(
+                """
+                SELECT r.* FROM recipients r
+                JOIN recipient_tags t ON t.recipient_id = r.id AND t.tag = ?
+                WHERE r.id > ? ORDER BY r.id LIMIT ?
+                """,
+                (tag, last_id, limit),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM recipients WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+            ).fetchall()
+        return self._with_tags(conn, rows)
+
+    @staticmethod
+    def _with_tags(conn, rows) -> list[dict]:
+        out = [dict(r) for r in rows]
+        if not out:
+            return out
+        ids = [r["id"] for r in out]
+        tags = {}
+        q = f"SELECT recipient_id, tag FROM recipient_tags WHERE recipient_id IN ({','.join('?' * len(ids))}) ORDER BY tag"
+        for t in conn.execute(q, ids):
+            tags.setdefault(t["recipient_id"], []).append(t["tag"])
+        for r in out:
+            r.pop("email_norm", None)
+            r["tags"] = tags.get(r["id"], [])
+        return out
+
+    def list_page(self, page: int = 1, per_page: int = 50, q: str = "", tag: str = "") -> dict:
+        page = max(1, page)
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+
+        where, params = [], []
+        join = ""
+        tag = normalize_tag(tag)
+        if tag:
+            join = "JOIN recipient_tags t ON t.recipient_id = r.id AND t.tag = ?"
+            params.append(tag)
+        if q:
+            where.append("r.email_norm LIKE ? ESCAPE '\\'")
+            params.append("%" + normalize_email(q).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+        with self.connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM recipients r {join} {where_sql}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT r.* FROM recipients r {join} {where_sql} ORDER BY r.id LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page],
+            ).fetchall()
+            items = self._with_tags(conn, rows)
+
+        return {"page": page, "per_page": per_page, "total": total, "items": items}
+
+    def get(self, recipient_id: int):
+        with self.connect() as conn:
+            rows = conn.execute("SELECT * FROM recipients WHERE id = ?", (recipient_id,)).fetchall()
+            items = self._with_tags(conn, rows)
+        return items[0] if items else None
+
+    def update(self, recipient_id: int, email: str = None, name: str = None, tags=None):
+        """Edit one recipient. Raises ValueError on an invalid or duplicate address."""
+        with self.connect() as conn:
+            if not conn.execute("SELECT 1 FROM recipients WHERE id = ?", (recipient_id,)).fetchone():
+                return None
+            if email is not None:
+                if not is_valid_email(email):
+                    raise ValueError(f"Invalid email: {email}")
+                try:
+                    conn.execute(
+                        "UPDATE recipients SET email = ?, email_norm = ?, updated_at = ? WHERE id = ?",
+                        (email.strip(), normalize_email(email), now_iso(), recipient_id),
+                    )
+                except sqlite3.IntegrityError:
+                    raise ValueError(f"Email already exists: {email}")
+            if name is not None:
+                conn.execute(
+                    "UPDATE recipients SET name = ?, updated_at = ? WHERE id = ?",
+                    (name.strip(), now_iso(), recipient_id),
+                )
+            if tags is not None:
+                conn.execute("DELETE FROM recipient_tags WHERE recipient_id = ?", (recipient_id,))
+                conn.executemany(
+                    "INSERT INTO recipient_tags (tag, recipient_id) VALUES (?, ?)",
+                    [(t, recipient_id) for t in normalize_tags(tags)],
+                )
+        return self.get(recipient_id)
+
+    def delete(self, ids: list[int]) -> int:
+        with self.connect() as conn:
+            return self._delete(conn, [int(i) for i in ids])
+
+    @staticmethod
+    def _delete(conn, ids: list[int]) -> int:
+        deleted = 0
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            cur = conn.execute(f"DELETE FROM recipients WHERE id IN ({','.join('?' * len(part))})", part)
+            deleted += cur.rowcount
+        return deleted
+
+    def replace_all(self, emails: list[str]) -> dict:
+        """
+        Legacy full-list save: keep exactly these addresses (tags of kept rows survive).
+        All-or-nothing: if any address is invalid, nothing is changed and result["invalid"] says why.
+        """
+        invalid = [e for e in emails if not is_valid_email(e)]
+        if invalid:
+            return {"read": len(emails), "inserted": 0, "updated": 0, "deleted": 0,
+                    "invalid": len(invalid), "invalid_samples": invalid[:20]}
+
+        keep = {normalize_email(e) for e in emails}
+        # one transaction: readers never see a half-replaced list
+        with self.connect() as conn:
+            result = self._upsert(conn, ({"email": e} for e in emails))
+            stale = [r["id"] for r in conn.execute("SELECT id, email_norm FROM recipients") if r["email_norm"] not in keep]
+            result["deleted"] = self._delete(conn, stale)
+        return result
+
+    def segments(self) -> list[dict]:
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT tag, COUNT(*) AS count FROM recipient_tags GROUP BY tag ORDER BY tag"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
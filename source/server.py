@@ -1,6 +1,11 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 import os
-import json
+
+from jobs import JobManager
+from recipients_store import RecipientStore
+from pipeline_io import iter_delta, iter_drafts, dumps_line
+import metrics
+from history_store import HistoryStore
 
 # ------------------------
 # Paths
@@ -19,11 +24,18 @@ os.makedirs(os.path.dirname(RECIPIENTS_FILE), exist_ok=True)
 
 print("Recipients.json path:", os.path.abspath(RECIPIENTS_FILE))
 
+# SQLite recipient directory (seeded once from recipients.json)
+recipient_store = RecipientStore()
+print("Recipients store path:", os.path.abspath(recipient_store.path))
+
 # ------------------------
 # Initialize Flask
 # ------------------------
 app = Flask(__name__, static_folder=FRONTEND_DIR)
 
+# Background pipeline jobs (see jobs.py)
+job_manager = JobManager(max_workers=int(os.getenv("JOB_WORKERS", "2")))
+
 # ------------------------
 # Routes for email_list.html
 # ------------------------
@@ -35,35 +47,268 @@ def index():
 
 @app.route('/get_recipients', methods=['GET'])
 def get_recipients():
-    """Return current recipients as JSON"""
-    if not os.path.exists(RECIPIENTS_FILE):
-        return jsonify({"emails": []})
-    with open(RECIPIENTS_FILE, 'r') as f:
-        data = json.load(f)
-    return jsonify(data)
+    """Return all recipients as JSON (legacy full list; prefer /recipients)"""
+    return jsonify({"emails": recipient_store.emails(request.args.get('tag', ''))})
 
 
 @app.route('/save_recipients', methods=['POST'])
 def save_recipients():
-    """Save recipients to JSON file"""
+    """Replace the recipient list (legacy full list; prefer /recipients)"""
     try:
-        data = request.get_json()
-        emails = data.get('emails', [])
+        data = request.get_json(silent=True)
+        emails = data.get('emails', []) if isinstance(data, dict) else None
+        if not isinstance(emails, list) or not all(isinstance(e, str) for e in emails):
+            return jsonify({"status": "error", "msg": 'Expected {"emails": [...]}.'}), 400
+        emails = [e.strip() for e in emails if e.strip()]
 
-        # Basic email validation
-        invalid = [e for e in emails if not e or '@' not in e]
-        if invalid:
-            return jsonify({"status": "error", "msg": f"Invalid emails: {invalid}"}), 400
+        result = recipient_store.replace_all(emails)
+        if result["invalid"]:
+            return jsonify({"status": "error", "msg": f"Invalid emails: {result['invalid_samples']}"}), 400
 
-        # Save to JSON
-        with open(RECIPIENTS_FILE, 'w') as f:
-            json.dump({"emails": emails}, f, indent=2)
-
-        print("Saved recipients:", emails)
+        print("Saved recipients:", result)
         return jsonify({"status": "success", "msg": "Recipients saved successfully."})
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)}), 500
 
+# ------------------------
+# Recipient store (paginated)
+# ------------------------
+@app.route('/recipients', methods=['GET'])
+def list_recipients():
+    """Paginated recipients: ?page=1&per_page=50&q=<substring>&tag=<segment>"""
+    return jsonify(recipient_store.list_page(
+        page=request.args.get('page', default=1, type=int),
+        per_page=request.args.get('per_page', default=50, type=int),
+        q=request.args.get('q', ''),
+        tag=request.args.get('tag', ''),
+    ))
+
+
+def recipient_rows(data):
+    """Rows of a POST /recipients body, or None if it is malformed"""
+    if not isinstance(data, dict):
+        return None
+    rows = data.get('recipients')
+    if not rows:
+        emails = data.get('emails', [])
+        if not isinstance(emails, list) or not all(isinstance(e, str) for e in emails):
+            return None
+        rows = [{"email": e} for e in emails]
+    if not isinstance(rows, list):
+        return None
+    for row in rows:
+        if not isinstance(row, dict) or not all(isinstance(row.get(k) or "", str) for k in ("email", "name")):
+            return None
+        if not isinstance(row.get("tags") or [], (list, str)):
+            return None
+    if not isinstance(data.get('tags') or [], (list, str)):
+        return None
+    return rows
+
+
+@app.route('/recipients', methods=['POST'])
+def add_recipients():
+    """Add or update recipients: {"recipients": [{"email", "name", "tags"}], "tags": [...]}"""
+    data = request.get_json(silent=True) or {}
+    rows = recipient_rows(data)
+    if rows is None:
+        return jsonify({"status": "error", "msg": 'Expected {"recipients": [{"email", "name", "tags"}], "tags": [...]} or {"emails": [...]}.'}), 400
+    result = recipient_store.import_rows(rows, data.get('tags'))
+    if result["invalid"] and not (result["inserted"] or result["updated"]):
+        return jsonify({"status": "error", "msg": f"Invalid emails: {result['invalid_samples']}", "result": result}), 400
+    return jsonify({"status": "success", "msg": "Recipients saved.", "result": result})
+
+
+@app.route('/recipients/<int:recipient_id>', methods=['PATCH'])
+def update_recipient(recipient_id):
+    """Edit one recipient's email, name or tags"""
+    data = request.get_json(silent=True) or {}
+    try:
+        item = recipient_store.update(recipient_id, data.get('email'), data.get('name'), data.get('tags'))
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+    if not item:
+        return jsonify({"status": "error", "msg": f"Recipient not found: {recipient_id}"}), 404
+    return jsonify({"status": "success", "msg": "Recipient updated.", "item": item})
+
+
+@app.route('/recipients/<int:recipient_id>', methods=['DELETE'])
+def delete_recipient(recipient_id):
+    """Delete one recipient"""
+    if not recipient_store.delete([recipient_id]):
+        return jsonify({"status": "error", "msg": f"Recipient not found: {recipient_id}"}), 404
+    return jsonify({"status": "success", "msg": "Recipient deleted."})
+
+
+@app.route('/recipients/delete', methods=['POST'])
+def delete_recipients():
+    """Delete several recipients: {"ids": [...]}"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids', []) if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"status": "error", "msg": 'Expected {"ids": [...]} with integer recipient ids.'}), 400
+    deleted = recipient_store.delete(ids)
+    return jsonify({"status": "success", "msg": f"{deleted} recipient(s) deleted.", "deleted": deleted})
+
+
+@app.route('/recipients/import', methods=['POST'])
+def import_recipients():
+    """Bulk import an uploaded CSV or JSONL file (form field "file"), optionally tagged with ?tag="""
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({"status": "error", "msg": "No file uploaded."}), 400
+
+    tags = request.args.getlist('tag') or request.form.getlist('tag')
+    name = (upload.filename or "").lower()
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        result = recipient_store.import_jsonl(upload.stream, tags)
+    else:
+        result = recipient_store.import_csv(upload.stream, tags)
+
+    print("Imported recipients:", {k: v for k, v in result.items() if k != "invalid_samples"})
+    return jsonify({"status": "success", "msg": f"Imported {result['inserted']} new, {result['updated']} existing.", "result": result})
+
+
+@app.route('/recipients/export', methods=['GET'])
+def export_recipients():
+    """Stream all recipients (or one ?tag= segment) as ?format=csv|jsonl"""
+    fmt = request.args.get('format', 'csv')
+    tag = request.args.get('tag', '')
+    if fmt == 'jsonl':
+        body, mimetype, ext = recipient_store.export_jsonl(tag), 'application/x-ndjson', 'jsonl'
+    else:
+        body, mimetype, ext = recipient_store.export_csv(tag), 'text/csv', 'csv'
+    headers = {"Content-Disposition": f"attachment; filename=recipients.{ext}"}
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+@app.route('/recipients/segments', methods=['GET'])
+def list_segments():
+    """List segment tags with member counts"""
+    return jsonify({"segments": recipient_store.segments()})
+
+# ------------------------
+# Pipeline jobs
+# ------------------------
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List recent jobs, newest first"""
+    return jsonify({"jobs": job_manager.list()})
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Start a full run ({"kind": "run", "force": false}) or one task ({"kind": "task", "task": "task1"}, always forced)"""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind', 'run')
+    task = data.get('task', '')
+    force = data.get('force') is True
+    try:
+        job, created = job_manager.submit(kind, task, force)
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+
+    msg = "Job queued." if created else "Joined an already active job."
+    return jsonify({"status": "success", "msg": msg, "created": created, "job": job.to_dict()}), 202 if created else 200
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return status and timings of one job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "msg": f"Job not found: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/log', methods=['GET'])
+def get_job_log(job_id):
+    """Return the captured stdout/stderr of a job (?tail=N for the last N lines)"""
+    if not job_manager.get(job_id):
+        return jsonify({"status": "error", "msg": f"Job not found: {job_id}"}), 404
+    tail = request.args.get('tail', default=0, type=int)
+    return job_manager.read_log(job_id, tail), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job or terminate a running one"""
+    job = job_manager.cancel(job_id)
+    if not job:
+        return jsonify({"status": "error", "msg": f"Job not found: {job_id}"}), 404
+    return jsonify({"status": "success", "msg": "Cancel requested.", "job": job.to_dict()})
+
+# ------------------------
+# Streaming pipeline outputs (NDJSON, one record per line)
+# ------------------------
+DATA_DIR = os.path.join(BASE_DIR, '..', 'data')
+OUT_DIR = os.path.join(BASE_DIR, '..', 'out')
+
+
+@app.route('/api/delta.ndjson', methods=['GET'])
+def stream_delta():
+    """Stream delta items with their events resolved, from events_delta.json or .jsonl"""
+    records = iter_delta(DATA_DIR)
+    return Response((dumps_line(r) for r in records), mimetype='application/x-ndjson')
+
+
+@app.route('/api/drafts.ndjson', methods=['GET'])
+def stream_drafts():
+    """
+    Stream drafts with their events resolved, from drafts.json or .jsonl.
+    While task 3 is running, the drafts finished so far (summary has in_progress: true).
+    """
+    records = iter_drafts(OUT_DIR, DATA_DIR, with_events=True, include_partial=True)
+    return Response((dumps_line(r) for r in records), mimetype='application/x-ndjson')
+
+# ------------------------
+# Event / draft history search
+# ------------------------
+history_store = HistoryStore()
+
+
+@app.route('/search', methods=['GET'])
+def search_history():
+    """
+    Full-text search over past events and drafts.
+    ?q=<words, last one prefix-matched>&kind=event|draft&status=&source=&date_from=&date_to=
+     &starts_from=&starts_to=&page=&per_page=
+    date_from/date_to: when the event was first seen / drafted; starts_from/starts_to: when the event takes place.
+    """
+    return jsonify(history_store.search(
+        q=request.args.get('q', ''),
+        kind=request.args.get('kind', ''),
+        status=request.args.get('status', ''),
+        source=request.args.get('source', ''),
+        date_from=request.args.get('date_from', ''),
+        date_to=request.args.get('date_to', ''),
+        starts_from=request.args.get('starts_from', ''),
+        starts_to=request.args.get('starts_to', ''),
+        page=request.args.get('page', default=1, type=int),
+        per_page=request.args.get('per_page', default=20, type=int),
+    ))
+
+
+@app.route('/history/<event_id>', methods=['GET'])
+def event_history(event_id):
+    """One event as last seen, with every draft made for it"""
+    item = history_store.event_history(event_id)
+    if not item:
+        return jsonify({"status": "error", "msg": f"Event not found: {event_id}"}), 404
+    return jsonify(item)
+
+# ------------------------
+# Metrics (latest report of each task, Prometheus text format)
+# ------------------------
+METRICS_DIR = os.path.join(BASE_DIR, '..', 'out', 'metrics')
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Expose the latest per-task run reports for Prometheus scraping"""
+    body = metrics.render_prometheus(metrics.load_reports(METRICS_DIR))
+    return body, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 # ------------------------
 # Serve frontend static files
 # ------------------------
@@ -81,6 +326,14 @@ def serve_data(filename):
     data_dir = os.path.join(BASE_DIR, '..', 'data')
     return send_from_directory(data_dir, filename)
 
+@app.route('/images/<path:filename>')
+def serve_image(filename):
+    """Serve cached email images; names are content hashes so they never change"""
+    image_dir = os.path.join(BASE_DIR, '..', 'out', 'images')
+    resp = send_from_directory(image_dir, filename, max_age=31536000)
+    resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return resp
+
 @app.route('/out/<path:filename>')
 def serve_out(filename):
     """Serve JSON or other files from /out folder"""
@@ -0,0 +1,47 @@
+import os
+
+from sites.base import ADAPTERS, SiteAdapter, register
+from sites.common import host_of, event_datetimes
+
+# Importing an adapter module registers it
+from sites import sccci  # noqa: F401
+
+# Comma-separated adapter names to crawl; empty = all registered sites
+CRAWL_SITES = os.getenv("CRAWL_SITES", "").strip()
+
+# Events scraped before adapters existed carry no source.site
+DEFAULT_SITE = "sccci"
+
+
+def enabled_adapters() -> list[SiteAdapter]:
+    if not CRAWL_SITES:
+        return list(ADAPTERS.values())
+    names = [n.strip().lower() for n in CRAWL_SITES.split(",") if n.strip()]
+    unknown = [n for n in names if n not in ADAPTERS]
+    if unknown:
+        raise ValueError(f"Unknown site adapter(s): {', '.join(unknown)}")
+    return [ADAPTERS[n] for n in names]
+
+
+def adapter_for_url(url: str):
+    host = host_of(url)
+    for adapter in ADAPTERS.values():
+        if host_of(adapter.base_url) == host:
+            return adapter
+    return None
+
+
+def site_of(event) -> str:
+    """Which site an event record (dict or event_model.Event) came from; also works for error records / old snapshots."""
+    if isinstance(event, dict):
+        source = event.get("source") or {}
+        site, url = source.get("site"), source.get("event_url") or event.get("event_url") or ""
+    else:
+        site, url = event.source.site, event.source.event_url or event.extra.get("event_url", "")
+    if site:
+        return site
+    adapter = adapter_for_url(url) if url else None
+    return adapter.name if adapter else DEFAULT_SITE
+
+
+__all__ = ["ADAPTERS", "SiteAdapter", "register", "enabled_adapters", "adapter_for_url", "site_of", "event_datetimes"]
@@ -0,0 +1,41 @@
+# Site adapter base class + registry.
+from abc import ABC, abstractmethod
+
+ADAPTERS: dict[str, "SiteAdapter"] = {}
+
+
+class SiteAdapter(ABC):
+    """
+    Listing + detail extraction for one events website.
+
+    Subclasses set the class attributes and implement the two extractors.
+    The crawl scheduler (crawl_scheduler.py) does all fetching, honouring
+    max_concurrency and crawl_delay per host.
+    """
+
+    name = ""                 # stored on every event as source.site
+    base_url = ""             # for resolving relative links
+    list_urls: tuple = ()     # listing pages to start from
+    max_concurrency = 2       # parallel page loads on this host
+    crawl_delay = 1.0         # seconds between request starts on this host
+
+    @abstractmethod
+    def extract_event_urls(self, html: str, list_url: str) -> list[str]:
+        """Absolute detail-page URLs found on one listing page."""
+
+    @abstractmethod
+    def parse_event_detail(self, html: str, event_url: str, list_url: str) -> dict:
+        """One event record (see sites.common.build_event_record)."""
+
+
+def register(cls):
+    """
+    Class decorator: make an adapter available under its name.
+    Instantiating here makes an incomplete adapter (missing extractor) fail at import, not mid-crawl.
+    """
+    if not cls.name or not cls.list_urls:
+        raise ValueError(f"Site adapter {cls.__name__} needs a name and list_urls")
+    if cls.name in ADAPTERS:
+        raise ValueError(f"Duplicate site adapter name: {cls.name}")
+    ADAPTERS[cls.name] = cls()
+    return cls
@@ -0,0 +1,267 @@
+import re
+import hashlib
+from datetime import datetime, timezone, timedelta
+from urllib.parse import urljoin, urlparse, parse_qsl, urlencode, urlunparse
+
+from bs4 import BeautifulSoup
+
+# Extraction helpers shared by all site adapters.
+
+SGT = timezone(timedelta(hours=8))
+
+
+def make_id(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+def normalize_url(href: str, base_url: str) -> str:
+    if not href:
+        return ""
+    if href.startswith("//"):
+        return "https:" + href
+    if href.startswith("http://") or href.startswith("https://"):
+        return href
+    return urljoin(base_url, href)
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+# for extracting images
+def normalize_image_url(src: str, base_url: str) -> str:
+    """
+    - Converts relative -> absolute
+    - Removes common tracking params (optional)
+    - Keeps essential params like ?c=... if the site uses it
+    """
+    if not src:
+        return ""
+    abs_url = urljoin(base_url, src)
+
+    # Optional cleanup: drop utm_ params only
+    parsed = urlparse(abs_url)
+    q = parse_qsl(parsed.query, keep_blank_values=True)
+    q = [(k, v) for (k, v) in q if not k.lower().startswith("utm_")]
+    new_query = urlencode(q, doseq=True)
+    return urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
+
+# for extracting signup link
+def extract_signup_link(soup) -> str:
+    # common registration providers / shortlinks
+    patterns = [
+        r"forms\.office\.com",
+        r"form\.gov\.sg",
+        r"formsg",
+        r"forms\.gle",
+        r"docs\.google\.com/forms",
+        r"go\.gov\.sg",
+        r"bit\.ly",
+    ]
+
+    # 1) try to find any <a> that links to these
+    for a in soup.select("a[href]"):
+        href = a.get("href", "").strip()
+        if not href:
+            continue
+        for p in patterns:
+            if re.search(p, href, re.I):
+                return href
+
+    # 2) fallback: button area like "Join this event"
+    btn = soup.select_one("div.link-btn a[href], a.btn[href]")
+    if btn:
+        return btn.get("href", "").strip()
+
+    return ""
+
+# for extracting location
+def extract_location(soup) -> str:
+    # Try: label style "Location : ..."
+    txt = soup.get_text("\n", strip=True)
+    m = re.search(r"Location\s*:\s*(.+)", txt, re.I)
+    if not m:
+        return ""
+    # take only the line after Location:
+    location = m.group(1).strip()
+    # stop at next line break if it accidentally captured too much
+    location = location.split("\n")[0].strip()
+    return location
+
+# for inferring provider from signup link
+def infer_provider(signup_link: str) -> str:
+    if not signup_link:
+        return ""
+    s = signup_link.lower()
+    if "forms.office.com" in s:
+        return "Microsoft Forms"
+    if "forms.gle" in s or "docs.google.com/forms" in s:
+        return "Google Forms"
+    if "form.gov.sg" in s:
+        return "FormSG"
+    if "sccci.org.sg/user/event/registerevent" in s:
+        return "SCCCI Registration"
+    return "Other"
+
+# scrape images function
+def extract_images(soup: BeautifulSoup, event_url: str) -> dict:
+    """
+    Returns nested dict:
+    {
+      "count": int,
+      "items": [{"url": "...", "alt": "...", "source": "main|content|any"}]
+    }
+    """
+    images = []
+    seen = set()
+
+    # Focus areas first (more likely relevant)
+    areas = [
+        ("main", soup.select_one(".main-container") or soup),
+        ("content", soup.select_one(".event-detail, .event-content, .event-description") or soup),
+    ]
+
+    def add_img(src: str, alt: str, source: str):
+        u = normalize_image_url(src, event_url)
+        if not u:
+            return
+        if u in seen:
+            return
+        seen.add(u)
+        images.append({
+            "url": u,
+            "alt": (alt or "").strip(),
+            "source": source,
+        })
+
+    # 1) normal <img src="...">
+    for source, area in areas:
+        for img in area.select("img"):
+            src = (img.get("src") or "").strip()
+            alt = (img.get("alt") or "").strip()
+            if not src:
+                continue
+            add_img(src, alt, source)
+
+    # 2) sometimes background-image in style=""
+    bg_imgs = soup.select('[style*="background-image"]')
+    for node in bg_imgs:
+        style = node.get("style", "")
+        m = re.search(r'background-image\s*:\s*url\(["\']?(.*?)["\']?\)', style, re.I)
+        if m:
+            add_img(m.group(1).strip(), "", "bg-style")
+
+    return {"count": len(images), "items": images}
+
+# for parsing dates / times (free text like "February 04, 2026 - February 04, 2026", "09:00 AM - 12:30 PM")
+DATE_FORMATS = ("%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y", "%B %d %Y", "%d/%m/%Y", "%Y-%m-%d")
+DATE_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4}"
+    r"|[A-Za-z]{3,9}\.?\s+\d{1,2},?\s+\d{4}|\d{1,2}\s+[A-Za-z]{3,9}\.?,?\s+\d{4}"
+)
+TIME_RE = re.compile(r"(\d{1,2})(?:[:.](\d{2}))?\s*([AaPp])\.?\s*[Mm]\b\.?|\b([01]?\d|2[0-3]):(\d{2})\b")
+
+
+def parse_date(text: str):
+    text = re.sub(r"\s+", " ", text.replace(".", "")).strip().rstrip(",")
+    text = re.sub(r"\bSept\b", "Sep", text, flags=re.I)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_times(time_range: str) -> list[tuple[int, int]]:
+    out = []
+    for m in TIME_RE.finditer(time_range or ""):
+        if m.group(3):
+            hour, minute = int(m.group(1)) % 12, int(m.group(2) or 0)
+            if m.group(3).lower() == "p":
+                hour += 12
+        else:
+            hour, minute = int(m.group(4)), int(m.group(5))
+        if minute < 60:
+            out.append((hour, minute))
+    return out
+
+
+def parse_event_datetimes(date_range: str, time_range: str = "") -> tuple[str, str]:
+    """
+    Free-text date/time range -> (start_at, end_at) as SGT ISO strings, "" where unparseable.
+    One date means a single-day event; no end time means the end of the last day.
+    """
+    dates = [d for d in (parse_date(m) for m in DATE_RE.findall(date_range or "")) if d]
+    if not dates:
+        return "", ""
+    start_date, end_date = dates[0], dates[-1]
+    times = parse_times(time_range)
+
+    start_h, start_m = times[0] if times else (0, 0)
+    start = datetime(start_date.year, start_date.month, start_date.day, start_h, start_m, tzinfo=SGT)
+    if len(times) > 1:
+        end = datetime(end_date.year, end_date.month, end_date.day, *times[-1], tzinfo=SGT)
+    else:
+        end = datetime(end_date.year, end_date.month, end_date.day, 23, 59, 59, tzinfo=SGT)
+    return start.isoformat(), max(start, end).isoformat()
+
+
+def event_datetimes(event: dict) -> tuple[datetime, datetime]:
+    """(start, end) of an event record as datetimes (None if unknown); parses the raw text for old snapshots."""
+    dt = (event.get("event") or {}).get("datetime") or {}
+    start_at, end_at = dt.get("start_at"), dt.get("end_at")
+    if start_at is None:
+        start_at, end_at = parse_event_datetimes(dt.get("date_range", ""), dt.get("time_range", ""))
+    return (
+        datetime.fromisoformat(start_at) if start_at else None,
+        datetime.fromisoformat(end_at) if end_at else None,
+    )
+
+# one event record, same schema for every site
+def build_event_record(
+    *,
+    site: str,
+    list_url: str,
+    event_url: str,
+    title: str,
+    date_range: str = "",
+    time_range: str = "",
+    location: str = "",
+    member_price: str = "",
+    non_member_price: str = "",
+    status: str = "Unknown",
+    signup_link: str = "",
+    images: dict = None,
+    description: str = "",
+) -> dict:
+    start_at, end_at = parse_event_datetimes(date_range, time_range)
+    return {
+        "event_id": make_id(event_url),
+        "source": {
+            "site": site,
+            "list_url": list_url,
+            "event_url": event_url,
+            "scraped_at": datetime.now(SGT).isoformat(),
+        },
+        "event": {
+            "title": title,
+            "datetime": {
+                "date_range": date_range,
+                "time_range": time_range,
+                "start_at": start_at,  # SGT ISO, "" if the text could not be parsed
+                "end_at": end_at,
+            },
+            "location": location,
+            "pricing": {
+                "member": member_price,
+                "non_member": non_member_price,
+            },
+            "status": status,
+        },
+        "registration": {
+            "signup_link": signup_link,
+            "provider": infer_provider(signup_link),
+        },
+        "media": {
+            "images": images or {"count": 0, "items": []}
+        },
+        "description_preview": description,  # keep if you still want it for AI drafting
+    }
@@ -0,0 +1,152 @@
+import re
+
+from bs4 import BeautifulSoup
+
+from sites.base import SiteAdapter, register
+from sites.common import (
+    normalize_url,
+    extract_signup_link,
+    extract_location,
+    extract_images,
+    build_event_record,
+)
+
+
+# for extracting prices
+def extract_prices(soup):
+    member_price = ""
+    non_member_price = ""
+
+    price_box = soup.select_one("div.event-info-box2")
+    if not price_box:
+        return member_price, non_member_price
+
+    txt = price_box.get_text(" ", strip=True)
+
+    def pick_value(label_regex: str):
+        """
+        Returns either 'Free' or numeric amount (e.g. 350.00) or ''.
+        label_regex should match ONLY the label (not the value).
+        """
+        # Free
+        m_free = re.search(rf"{label_regex}\s*:?\s*(Free)\b", txt, re.I)
+        if m_free:
+            return "Free"
+
+        # $ amount
+        m_amt = re.search(
+            rf"{label_regex}\s*:?\s*\$\s*([0-9,]+(?:\.[0-9]{{2}})?)",
+            txt,
+            re.I
+        )
+        return m_amt.group(1) if m_amt else ""
+
+    # IMPORTANT:
+    # - non-member is straightforward
+    # - member must NOT match non-member price"
+    non_member_price = pick_value(r"\bNon-?Member Price\b")
+    member_price = pick_value(r"(?<!Non-)\bMember Price\b")  # key fix
+
+    return member_price, non_member_price
+
+# for extracting status
+def extract_status(soup) -> str:
+    main = soup.select_one(".main-container") or soup
+    txt = main.get_text(" ", strip=True).lower()
+
+    if "closed" in txt:
+        return "Closed"
+    if "open for registration" in txt or "join this event" in txt or "click here to register" in txt:
+        return "Open"
+    return "Unknown"
+
+
+@register
+class SccciAdapter(SiteAdapter):
+    """Singapore Chinese Chamber of Commerce & Industry events."""
+
+    name = "sccci"
+    base_url = "https://www.sccci.org.sg/"
+    list_urls = ("https://www.sccci.org.sg/event/index",)
+    max_concurrency = 2
+    crawl_delay = 1.0
+
+    def extract_event_urls(self, html: str, list_url: str) -> list[str]:
+        soup = BeautifulSoup(html, "lxml")
+
+        event_urls = []
+        seen = set()
+
+        for a in soup.select('a[href*="/event/detail?slug="]'):
+            href = a.get("href", "").strip()
+            if not href:
+                continue
+            url = normalize_url(href, self.base_url)
+            if url in seen:
+                continue
+            seen.add(url)
+            event_urls.append(url)
+
+        return event_urls
+
+    def parse_event_detail(self, html: str, event_url: str, list_url: str) -> dict:
+        soup = BeautifulSoup(html, "lxml")
+
+        # Title
+        title = ""
+        h1 = soup.select_one("div.pageTitle h1, h1")
+        if h1:
+            title = h1.get_text(strip=True)
+
+        # date + time
+        date_range = ""
+        time_range = ""
+        for row in soup.select("div.event-info-box div.event-info-row"):
+            icon = row.select_one("i")
+            txt = row.get_text(" ", strip=True)
+            if not icon:
+                continue
+            classes = " ".join(icon.get("class", []))
+            if "fa-calendar-alt" in classes:
+                date_range = txt.replace("(add to calendar)", "").strip()
+            elif "fa-clock" in classes:
+                time_range = txt.strip()
+
+        # prices
+        member_price, non_member_price = extract_prices(soup)
+
+        # description preview
+        desc = ""
+        body = soup.select_one(".event-detail, .event-content, .event-description, .main-container")
+        if body:
+            desc = body.get_text(" ", strip=True)
+            desc = re.sub(r"\s+", " ", desc).strip()
+            desc = desc[:800]
+
+        # signup link + cleanup
+        signup_link = extract_signup_link(soup)
+        if signup_link == "#":
+            signup_link = ""
+
+        # location + status
+        location = extract_location(soup)
+        status = extract_status(soup)
+
+        # images
+        images = extract_images(soup, event_url)
+
+        return build_event_record(
+            site=self.name,
+            list_url=list_url,
+            event_url=event_url,
+            title=title,
+            date_range=date_range,
+            time_range=time_range,
+            location=location,
+            member_price=member_price,
+            non_member_price=non_member_price,
+            status=status,
+            signup_link=signup_link,
+            images=images,
+            description=desc,
+        )
@@ -1,335 +1,206 @@
-import json
-import hashlib
-from datetime import datetime, timezone, timedelta
+import os
+import time
+import random
+import asyncio
+from datetime import datetime
 from pathlib import Path
-from urllib.parse import urljoin, urlparse, parse_qsl, urlencode, urlunparse
-import re
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from playwright.async_api import async_playwright
+
+from pipeline_io import load_json, write_json
+from crawl_scheduler import CrawlScheduler, DeadlineExceeded, GLOBAL_CONCURRENCY, USER_AGENT
+from sites import enabled_adapters
+from sites.common import SGT, make_id
+import metrics
 
-LIST_URL = "https://www.sccci.org.sg/event/index"
 OUT = Path("data/events_current.json")
+PREVIOUS = Path("data/events_previous.json")
 
-SGT = timezone(timedelta(hours=8))
-
-
-def make_id(url: str) -> str:
-    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
-
-def normalize_url(href: str) -> str:
-    if not href:
-        return ""
-    if href.startswith("//"):
-        return "https:" + href
-    if href.startswith("/"):
-        return "https://www.sccci.org.sg" + href
-    if href.startswith("http://") or href.startswith("https://"):
-        return href
-    return urljoin("https://www.sccci.org.sg/", href)
-
-# for extracting prices
-def extract_prices(soup):
-    member_price = ""
-    non_member_price = ""
-
-    price_box = soup.select_one("div.event-info-box2")
-    if not price_box:
-        return member_price, non_member_price
-
-    txt = price_box.get_text(" ", strip=True)
-
-    def pick_value(label_regex: str):
-        """
-        Returns either 'Free' or numeric amount (e.g. 350.00) or ''.
-        label_regex should match ONLY the label (not the value).
-        """
-        # Free
-        m_free = re.search(rf"{label_regex}\s*:?\s*(Free)\b", txt, re.I)
-        if m_free:
-            return "Free"
-
-        # $ amount
-        m_amt = re.search(
-            rf"{label_regex}\s*:?\s*\$\s*([0-9,]+(?:\.[0-9]{{2}})?)",
-            txt,
-            re.I
-        )
-        return m_amt.group(1) if m_amt else ""
-
-    # IMPORTANT:
-    # - non-member is straightforward
-    # - member must NOT match non-member price"
-    non_member_price = pick_value(r"\bNon-?Member Price\b")
-    member_price = pick_value(r"(?<!Non-)\bMember Price\b")  # key fix
-
-    return member_price, non_member_price
-
-# for extracting images
-def normalize_image_url(src: str, base_url: str) -> str:
-    """
-    - Converts relative -> absolute
-    - Removes common tracking params (optional)
-    - Keeps essential params like ?c=... if the site uses it
-    """
-    if not src:
-        return ""
-    abs_url = urljoin(base_url, src)
-
-    # Optional cleanup: drop utm_ params only
-    parsed = urlparse(abs_url)
-    q = parse_qsl(parsed.query, keep_blank_values=True)
-    q = [(k, v) for (k, v) in q if not k.lower().startswith("utm_")]
-    new_query = urlencode(q, doseq=True)
-    return urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
-
-# for extracting signup link
-def extract_signup_link(soup) -> str:
-    # common registration providers / shortlinks
-    patterns = [
-        r"forms\.office\.com",
-        r"form\.gov\.sg",
-        r"formsg",
-        r"forms\.gle",
-        r"docs\.google\.com/forms",
-        r"go\.gov\.sg",
-        r"bit\.ly",
-    ]
-
-    # 1) try to find any <a> that links to these
-    for a in soup.select("a[href]"):
-        href = a.get("href", "").strip()
-        if not href:
-            continue
-        for p in patterns:
-            if re.search(p, href, re.I):
-                return href
-
-    # 2) fallback: button area like "Join this event"
-    btn = soup.select_one("div.link-btn a[href], a.btn[href]")
-    if btn:
-        return btn.get("href", "").strip()
-
-    return ""
-
-# for extracting location
-def extract_location(soup) -> str:
-    # Try: label style "Location : ..."
-    txt = soup.get_text("\n", strip=True)
-    m = re.search(r"Location\s*:\s*(.+)", txt, re.I)
-    if not m:
-        return ""
-    # take only the line after Location:
-    location = m.group(1).strip()
-    # stop at next line break if it accidentally captured too much
-    location = location.split("\n")[0].strip()
-    return location
-
-# for extracting status
-def extract_status(soup) -> str:
-    main = soup.select_one(".main-container") or soup
-    txt = main.get_text(" ", strip=True).lower()
-
-    if "closed" in txt:
-        return "Closed"
-    if "open for registration" in txt or "join this event" in txt or "click here to register" in txt:
-        return "Open"
-    return "Unknown"
-
-# for inferring provider from signup link
-def infer_provider(signup_link: str) -> str:
-    if not signup_link:
-        return ""
-    s = signup_link.lower()
-    if "forms.office.com" in s:
-        return "Microsoft Forms"
-    if "forms.gle" in s or "docs.google.com/forms" in s:
-        return "Google Forms"
-    if "form.gov.sg" in s:
-        return "FormSG"
-    if "sccci.org.sg/user/event/registerevent" in s:
-        return "SCCCI Registration"
-    return "Other"
-
-# scrape images function
-def extract_images(soup: BeautifulSoup, event_url: str) -> dict:
-    """
-    Returns nested dict:
-    {
-      "count": int,
-      "items": [{"url": "...", "alt": "...", "source": "main|content|any"}]
-    }
-    """
-    images = []
-    seen = set()
+# Set CRAWL_RESPECT_ROBOTS=0 to skip robots.txt checks
+RESPECT_ROBOTS = os.getenv("CRAWL_RESPECT_ROBOTS", "1").strip() not in ("0", "false", "no")
+
+# Failed pages are retried after the main pass: up to CRAWL_RETRY_ROUNDS rounds,
+# waiting CRAWL_RETRY_BACKOFF_SECONDS * 2^(round-1) (+ jitter) before each, deadline permitting
+RETRY_ROUNDS = int(os.getenv("CRAWL_RETRY_ROUNDS", "2"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("CRAWL_RETRY_BACKOFF_SECONDS", "5"))
 
-    # Focus areas first (more likely relevant)
-    areas = [
-        ("main", soup.select_one(".main-container") or soup),
-        ("content", soup.select_one(".event-detail, .event-content, .event-description") or soup),
-    ]
-
-    def add_img(src: str, alt: str, source: str):
-        u = normalize_image_url(src, event_url)
-        if not u:
-            return
-        if u in seen:
-            return
-        seen.add(u)
-        images.append({
-            "url": u,
-            "alt": (alt or "").strip(),
-            "source": source,
-        })
-
-    # 1) normal <img src="...">
-    for source, area in areas:
-        for img in area.select("img"):
-            src = (img.get("src") or "").strip()
-            alt = (img.get("alt") or "").strip()
-            if not src:
-                continue
-            add_img(src, alt, source)
-
-    # 2) sometimes background-image in style=""
-    bg_imgs = soup.select('[style*="background-image"]')
-    for node in bg_imgs:
-        style = node.get("style", "")
-        m = re.search(r'background-image\s*:\s*url\(["\']?(.*?)["\']?\)', style, re.I)
-        if m:
-            add_img(m.group(1).strip(), "", "bg-style")
-
-    return {"count": len(images), "items": images}
-
-# scrape event detail page function
-def scrape_event_detail(page, event_url: str) -> dict:
-    page.goto(event_url, timeout=60000)
-    page.wait_for_load_state("networkidle")
-
-    soup = BeautifulSoup(page.content(), "lxml")
-
-    # Title
-    title = ""
-    h1 = soup.select_one("div.pageTitle h1, h1")
-    if h1:
-        title = h1.get_text(strip=True)
-
-    # date + time
-    date_range = ""
-    time_range = ""
-    for row in soup.select("div.event-info-box div.event-info-row"):
-        icon = row.select_one("i")
-        txt = row.get_text(" ", strip=True)
-        if not icon:
-            continue
-        classes = " ".join(icon.get("class", []))
-        if "fa-calendar-alt" in classes:
-            date_range = txt.replace("(add to calendar)", "").strip()
-        elif "fa-clock" in classes:
-            time_range = txt.strip()
-
-    # prices
-    member_price, non_member_price = extract_prices(soup)
-
-    # description preview
-    desc = ""
-    body = soup.select_one(".event-detail, .event-content, .event-description, .main-container")
-    if body:
-        desc = body.get_text(" ", strip=True)
-        desc = re.sub(r"\s+", " ", desc).strip()
-        desc = desc[:800]
-
-    # signup link + cleanup
-    signup_link = extract_signup_link(soup)
-    if signup_link == "#":
-        signup_link = ""
-
-    # location + status
-    location = extract_location(soup)
-    status = extract_status(soup)
-
-    # images
-    images = extract_images(soup, event_url)
+# Not worth retrying: robots.txt says no, or we are out of time
+PERMANENT_ERRORS = (PermissionError, DeadlineExceeded)
 
+
+def error_record(adapter, list_url: str, url: str, e: Exception) -> dict:
     return {
-        "event_id": make_id(event_url),
+        "event_id": make_id(url),
+        "event_url": url,
+        "error": str(e),
+        "scraped_at": datetime.now(SGT).isoformat(),
         "source": {
-            "list_url": LIST_URL,
-            "event_url": event_url,
-            "scraped_at": datetime.now(SGT).isoformat(),
-        },
-        "event": {
-            "title": title,
-            "datetime": {
-                "date_range": date_range,
-                "time_range": time_range,
-            },
-            "location": location,
-            "pricing": {
-                "member": member_price,
-                "non_member": non_member_price,
-            },
-            "status": status,
+            "site": adapter.name,
+            "list_url": list_url,
+            "event_url": url,
         },
-        "registration": {
-            "signup_link": signup_link,
-            "provider": infer_provider(signup_link),
-        },
-        "media": {
-            "images": images
+    }
+
+
+def load_last_good() -> dict[str, dict]:
+    """Last successfully scraped record of every event: the previous snapshot, overridden by the last run's output."""
+    out = {}
+    for path in (PREVIOUS, OUT):
+        for e in load_json(path, []):
+            if e.get("event_id") and "error" not in e:
+                out[e["event_id"]] = e
+    return out
+
+
+def stale_record(last: dict, e: Exception) -> dict:
+    """The last good record of an event whose page failed this run, flagged so nobody mistakes it for fresh data."""
+    stale = last.get("stale") or {}
+    return {
+        **last,
+        "stale": {
+            "error": str(e),
+            "last_scraped_at": stale.get("last_scraped_at") or (last.get("source") or {}).get("scraped_at", ""),
+            "marked_at": datetime.now(SGT).isoformat(),
         },
-        "description_preview": desc,  # keep if you still want it for AI drafting
     }
-    
+
+
+def retry_delay(round_no: int) -> float:
+    base = RETRY_BACKOFF_SECONDS * 2 ** (round_no - 1)
+    return base + random.uniform(0, base / 2)
+
+
+async def scrape_event_detail(scheduler: CrawlScheduler, adapter, list_url: str, event_url: str) -> dict:
+    t0 = time.perf_counter()
+    html = await scheduler.fetch(event_url, adapter, kind="detail")
+    t1 = time.perf_counter()
+
+    record = adapter.parse_event_detail(html, event_url, list_url)
+    t2 = time.perf_counter()
+
+    metrics.observe("parse_seconds", t2 - t1, kind="detail", site=adapter.name)
+    metrics.record("detail_pages", site=adapter.name, url=event_url, fetch_s=round(t1 - t0, 3), parse_s=round(t2 - t1, 3))
+    return record
+
+
+async def scrape_listing(scheduler: CrawlScheduler, adapter, list_url: str) -> list[str]:
+    html = await scheduler.fetch(list_url, adapter, kind="list")
+    with metrics.timer("parse_seconds", kind="list", site=adapter.name):
+        return adapter.extract_event_urls(html, list_url)
+
+
+async def crawl_site(scheduler: CrawlScheduler, adapter, last_good: dict[str, dict]) -> list[dict]:
+    """
+    Listing pages first, then every detail page (all queued at once).
+    Failed pages go to a retry queue worked through after the main pass; pages that still
+    fail fall back to their last good record (marked stale), or an error record if there is none.
+    """
+    seen = set()
+    records = {}  # event_url -> record, in discovery order
+    failed_lists = {}  # list_url -> exception
+    failed = {}  # event_url -> (list_url, exception)
+
+    async def listing(list_url: str) -> list[tuple[str, str]]:
+        try:
+            urls = await scrape_listing(scheduler, adapter, list_url)
+        except Exception as e:
+            metrics.inc("listing_errors", site=adapter.name)
+            print(f"[Task 1] {adapter.name}: listing failed {list_url}: {e}")
+            failed_lists[list_url] = e
+            return []
+        failed_lists.pop(list_url, None)
+        jobs = []
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                records[url] = None
+                jobs.append((list_url, url))
+        metrics.inc("event_links_found", len(jobs), site=adapter.name)
+        return jobs
+
+    async def one(list_url: str, url: str):
+        try:
+            records[url] = await scrape_event_detail(scheduler, adapter, list_url, url)
+            failed.pop(url, None)
+            metrics.inc("events_scraped", site=adapter.name)
+        except Exception as e:
+            metrics.inc("scrape_errors", site=adapter.name)
+            failed[url] = (list_url, e)
+
+    async def run_pass(list_urls, detail_jobs):
+        for list_url in list_urls:
+            detail_jobs = detail_jobs + await listing(list_url)
+        await asyncio.gather(*(one(lu, u) for lu, u in detail_jobs))
+
+    await run_pass(adapter.list_urls, [])
+
+    for round_no in range(1, RETRY_ROUNDS + 1):
+        retry_lists = [u for u, e in failed_lists.items() if not isinstance(e, PERMANENT_ERRORS)]
+        retry_details = [(lu, u) for u, (lu, e) in failed.items() if not isinstance(e, PERMANENT_ERRORS)]
+        if not retry_lists and not retry_details:
+            break
+        delay = retry_delay(round_no)
+        if delay >= scheduler.remaining():
+            print(f"[Task 1] {adapter.name}: no time left to retry {len(retry_lists) + len(retry_details)} page(s)")
+            break
+        print(f"[Task 1] {adapter.name}: retry round {round_no}: "
+              f"{len(retry_lists) + len(retry_details)} page(s) in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        metrics.inc("fetch_retries", len(retry_lists) + len(retry_details), site=adapter.name)
+        await run_pass(retry_lists, retry_details)
+
+    for url, (list_url, e) in failed.items():
+        last = last_good.get(make_id(url))
+        if last:
+            metrics.inc("events_stale", site=adapter.name)
+            records[url] = stale_record(last, e)
+        else:
+            records[url] = error_record(adapter, list_url, url, e)
+
+    # A listing that never loaded hides its events: keep the ones we knew about
+    for list_url, e in failed_lists.items():
+        for last in last_good.values():
+            src = last.get("source") or {}
+            if src.get("site") == adapter.name and src.get("list_url") == list_url and src.get("event_url") not in records:
+                metrics.inc("events_stale", site=adapter.name)
+                records[src["event_url"]] = stale_record(last, e)
+
+    return [r for r in records.values() if r is not None]
+
+
+async def crawl() -> list[dict]:
+    adapters = enabled_adapters()
+    last_good = load_last_good()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context(user_agent=USER_AGENT)
+        scheduler = CrawlScheduler(context, GLOBAL_CONCURRENCY, RESPECT_ROBOTS)
+
+        # all sites at once; the scheduler keeps each host polite
+        per_site = await asyncio.gather(*(crawl_site(scheduler, a, last_good) for a in adapters))
+
+        await context.close()
+        await browser.close()
+
+    for adapter, events in zip(adapters, per_site):
+        stale = sum(1 for e in events if e.get("stale"))
+        errors = sum(1 for e in events if "error" in e)
+        print(f"[Task 1] {adapter.name}: {len(events)} events ({stale} stale, {errors} failed)")
+    return [e for events in per_site for e in events]
+
 
 def main():
     OUT.parent.mkdir(parents=True, exist_ok=True)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-
-        # 1) Load listing page
-        page.goto(LIST_URL, timeout=60000)
-        page.wait_for_load_state("networkidle")
-
-        html = page.content()
-        soup = BeautifulSoup(html, "lxml")
-
-        # 2) Extract ONLY event detail links
-        event_urls = []
-        seen = set()
-
-        for a in soup.select('a[href*="/event/detail?slug="]'):
-            href = a.get("href", "").strip()
-            if not href:
-                continue
-            url = normalize_url(href)
-            if url in seen:
-                continue
-            seen.add(url)
-            event_urls.append(url)
-
-        # 3) Visit each detail page and scrape info
-        events = []
-        for url in event_urls:
-            try:
-                events.append(scrape_event_detail(page, url))
-            except Exception as e:
-                events.append({
-                    "event_id": make_id(url),
-                    "event_url": url,
-                    "error": str(e),
-                    "scraped_at": datetime.now(SGT).isoformat(),
-                })
-
-        browser.close()
+    events = asyncio.run(crawl())
 
     # Save
-    OUT.write_text(json.dumps(events, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_json(OUT, events)
     print(f"[Task 1] Events scraped: {len(events)}")
     print(f"Saved: {OUT.resolve()}")
+    print("[Task 1] Metrics:", metrics.write_report("task1").resolve())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
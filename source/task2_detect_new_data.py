@@ -1,119 +1,256 @@
-import json
+import os
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 
+from pipeline_io import write_json, write_delta
+from sites import site_of
+from event_model import Event, load_events
+from dedup_index import DedupIndex, DEFAULT_THRESHOLD
+from history_store import HistoryStore
+import metrics
+
 DATA_DIR = Path("data")
 CURRENT = DATA_DIR / "events_current.json"
 PREVIOUS = DATA_DIR / "events_previous.json"
-DELTA = DATA_DIR / "events_delta.json"
 
 SGT = timezone(timedelta(hours=8))
 
+# What to do with NEW events that look like an event we already know:
+#   off      - no duplicate detection
+#   tag      - keep them, with "duplicate_of" / "similarity" set (default)
+#   suppress - drop them from the delta
+#   merge    - report them as an UPDATE of the original event (dropped if nothing changed)
+DEDUP_POLICY = os.getenv("DEDUP_POLICY", "tag").strip().lower()
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", str(DEFAULT_THRESHOLD)))
 
-def load_json(path: Path, default):
-    if not path.exists():
-        return default
-    return json.loads(path.read_text(encoding="utf-8"))
+# Promotion window: only events that haven't started yet and start within this many days
+# are diffed (and so drafted/sent). "off" disables the window; 0 = no upper bound.
+# Events outside the window stay out of the previous snapshot, so they show up as NEW once they enter it.
+PROMOTION_WINDOW = os.getenv("PROMOTION_WINDOW_DAYS", "60").strip().lower()
+PROMOTION_WINDOW_DAYS = None if PROMOTION_WINDOW in ("", "off") else int(PROMOTION_WINDOW)
+# Whether events whose date text could not be parsed are still promoted
+PROMOTE_UNDATED = os.getenv("PROMOTE_UNDATED", "1").strip().lower() not in ("0", "false", "no")
 
 
-def index_by_event_id(events: list[dict]) -> dict[str, dict]:
-    out = {}
-    for e in events:
-        eid = e.get("event_id")
-        if eid:
-            out[eid] = e
-    return out
+def index_by_event_id(events: list[Event]) -> dict[str, Event]:
+    return {e.event_id: e for e in events if e.event_id}
 
 
-def fingerprint(e: dict) -> dict:
-    """
-    Keep only fields that matter for emailing.
-    If any of these change, we treat it as an update.
-    """
-    event = e.get("event", {})
-    dt = event.get("datetime", {})
-    pricing = event.get("pricing", {})
-    reg = e.get("registration", {})
-    media = e.get("media", {})
-    images = (media.get("images") or {}).get("items", [])
-    image_urls = [img.get("url", "") for img in images if img.get("url")]
-
-    return {
-        "title": event.get("title", ""),
-        "date_range": dt.get("date_range", ""),
-        "time_range": dt.get("time_range", ""),
-        "location": event.get("location", ""),
-        "member_price": pricing.get("member", ""),
-        "non_member_price": pricing.get("non_member", ""),
-        "status": event.get("status", ""),
-        "signup_link": reg.get("signup_link", ""),
-        "provider": reg.get("provider", ""),
-        "image_urls": sorted(set(image_urls)),
-    }
+def promotion_status(e: Event, now: datetime) -> str:
+    """"" if the event may be promoted now, else why not: started | too_far | undated."""
+    if PROMOTION_WINDOW_DAYS is None or e.is_error:
+        return ""
+    start, _ = e.starts_ends()
+    if start is None:
+        return "" if PROMOTE_UNDATED else "undated"
+    if start <= now:
+        return "started"
+    if PROMOTION_WINDOW_DAYS and start > now + timedelta(days=PROMOTION_WINDOW_DAYS):
+        return "too_far"
+    return ""
 
 
-def main():
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
+def apply_promotion_window(events: list[Event], now: datetime, summary: dict) -> list[Event]:
+    """Events inside the promotion window; counts the rest in summary["outside_window"]."""
+    kept = []
+    outside = summary.setdefault("outside_window", {})
+    for e in events:
+        reason = promotion_status(e, now)
+        if reason:
+            outside[reason] = outside.get(reason, 0) + 1
+            continue
+        kept.append(e)
+    return kept
 
-    current_list = load_json(CURRENT, [])
-    prev_list = load_json(PREVIOUS, [])
 
-    current = index_by_event_id(current_list)
-    prev = index_by_event_id(prev_list)
+def group_by_site(events: list[Event]) -> dict[str, list[Event]]:
+    out = {}
+    for e in events:
+        out.setdefault(site_of(e), []).append(e)
+    return out
 
+
+def detect_changes(current: dict[str, Event], prev: dict[str, Event], summary: dict) -> list[dict]:
     delta = []
-    summary = {
-        "run_at": datetime.now(SGT).isoformat(),
-        "current_count": len(current),
-        "previous_count": len(prev),
-        "new": 0,
-        "updated": 0,
-        "skipped_closed": 0,
-    }
 
     for eid, cur_event in current.items():
-        cur_fp = fingerprint(cur_event)
-
         # Skip Closed/Unknown
-        if cur_fp.get("status") != "Open":
+        if cur_event.status != "Open":
             summary["skipped_closed"] += 1
             continue
 
-        if eid not in prev:
+        prev_event = prev.get(eid)
+        if prev_event is None:
             delta.append({
                 "change_type": "NEW",
                 "event_id": eid,
-                "event": cur_event,
+                "event": cur_event.to_dict(),
             })
             summary["new"] += 1
             continue
 
-        prev_fp = fingerprint(prev[eid])
-
-        if cur_fp != prev_fp:
+        # fingerprint dicts are only built for the events that actually changed
+        if cur_event.digest != prev_event.digest:
             delta.append({
                 "change_type": "UPDATED",
                 "event_id": eid,
-                "before": prev_fp,
-                "after": cur_fp,
-                "event": cur_event,
+                "before": prev_event.fingerprint(),
+                "after": cur_event.fingerprint(),
+                "event": cur_event.to_dict(),
             })
             summary["updated"] += 1
 
-    output = {
-        "summary": summary,
-        "items": delta
+    return delta
+
+
+def apply_dedup(delta: list[dict], current_list: list[Event], prev_list: list[Event], summary: dict) -> list[dict]:
+    """Link NEW items to near-duplicate known events and apply DEDUP_POLICY."""
+    index = DedupIndex(threshold=DEDUP_THRESHOLD)
+    known = {**index_by_event_id(prev_list), **index_by_event_id(current_list)}
+    new_ids = {item["event_id"] for item in delta if item["change_type"] == "NEW"}
+
+    # Everything we can see that isn't NEW is a potential original
+    for e in current_list:
+        eid = e.event_id
+        if not eid or e.is_error or eid in new_ids:
+            continue
+        index.add(e)  # re-signed only if its title or description changed
+
+    summary["duplicates"] = 0
+    summary["suppressed_duplicates"] = 0
+    out = []
+    for item in delta:
+        if item["change_type"] != "NEW":
+            out.append(item)
+            continue
+
+        event = item["event"]
+        typed = known.get(item["event_id"]) or Event.from_dict(event)
+        sig = index.signature(typed)
+        match = index.find_duplicate(typed, sig)
+        index.add(typed, sig)  # later items in this run can match this one
+        if not match:
+            out.append(item)
+            continue
+
+        original_id, sim = match
+        summary["duplicates"] += 1
+        item["duplicate_of"] = original_id
+        item["similarity"] = round(sim, 3)
+
+        if DEDUP_POLICY == "suppress":
+            summary["suppressed_duplicates"] += 1
+            continue
+
+        if DEDUP_POLICY == "merge":
+            original = known.get(original_id)
+            if not original or original.digest == typed.digest:
+                summary["suppressed_duplicates"] += 1
+                continue
+            item = {
+                "change_type": "UPDATED",
+                "event_id": original_id,
+                "merged_from": event.get("event_id"),
+                "similarity": round(sim, 3),
+                "before": original.fingerprint(),
+                "after": typed.fingerprint(),
+                "event": event,
+                **({"site": item["site"]} if "site" in item else {}),
+            }
+
+        out.append(item)
+
+    index.save()
+    return out
+
+
+def main():
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+    with metrics.timer("load_seconds"):
+        current_list = load_events(CURRENT)
+        prev_list = load_events(PREVIOUS)
+
+    summary = {
+        "run_at": datetime.now(SGT).isoformat(),
+        "current_count": len(index_by_event_id(current_list)),
+        "previous_count": len(index_by_event_id(prev_list)),
+        "new": 0,
+        "updated": 0,
+        "skipped_closed": 0,
+        "outside_window": {},
+        "promotion_window_days": PROMOTION_WINDOW_DAYS,
+        "by_source": {},
     }
+    now = datetime.now(SGT)
+
+    current_by_site = group_by_site(current_list)
+    prev_by_site = group_by_site(prev_list)
+
+    delta = []
+    next_previous = []
+
+    # Diff each source against its own previous snapshot
+    with metrics.timer("diff_seconds"):
+        for site in sorted(set(current_by_site) | set(prev_by_site)):
+            cur_events = current_by_site.get(site, [])
+            prev_events = prev_by_site.get(site, [])
+            site_summary = {
+                "current_count": len(cur_events),
+                "previous_count": len(prev_events),
+                "new": 0,
+                "updated": 0,
+                "skipped_closed": 0,
+            }
+            summary["by_source"][site] = site_summary
+
+            # Site not crawled this run (disabled or every page failed):
+            # keep its old snapshot so its events don't all come back as NEW next time
+            if all(e.is_error for e in cur_events):
+                site_summary["not_crawled"] = True
+                next_previous.extend(prev_events)
+                continue
+
+            # Past / far-future events never reach fingerprinting, drafting or sending
+            cur_events = apply_promotion_window(cur_events, now, site_summary)
+
+            site_delta = detect_changes(index_by_event_id(cur_events), index_by_event_id(prev_events), site_summary)
+            for item in site_delta:
+                item["site"] = site
+            delta.extend(site_delta)
+            next_previous.extend(cur_events)
+
+            for key in ("new", "updated", "skipped_closed"):
+                summary[key] += site_summary[key]
+            for reason, count in site_summary["outside_window"].items():
+                summary["outside_window"][reason] = summary["outside_window"].get(reason, 0) + count
+
+    if DEDUP_POLICY != "off":
+        with metrics.timer("dedup_seconds"):
+            delta = apply_dedup(delta, current_list, prev_list, summary)
+        metrics.inc("events_duplicates", summary["duplicates"])
+
+    with metrics.timer("write_seconds"):
+        delta_path = write_delta(summary, delta, DATA_DIR)
+
+        # After detecting delta, update previous snapshot for next run
+        write_json(PREVIOUS, [e.to_dict() for e in next_previous])
 
-    DELTA.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Keep every event we have seen searchable after the snapshot is overwritten
+    with metrics.timer("history_index_seconds"):
+        indexed = HistoryStore().index_events(current_list, summary["run_at"])
 
-    # After detecting delta, update previous snapshot for next run
-    PREVIOUS.write_text(json.dumps(current_list, ensure_ascii=False, indent=2), encoding="utf-8")
+    for change in ("new", "updated", "skipped_closed"):
+        metrics.inc("events_" + change, summary[change])
+    for reason, count in summary["outside_window"].items():
+        metrics.inc("events_outside_window", count, reason=reason)
 
-    print("[Task 2] Delta written:", DELTA.resolve())
+    print("[Task 2] Delta written:", delta_path.resolve())
     print("[Task 2] Previous snapshot updated:", PREVIOUS.resolve())
     print("Summary:", summary)
+    print("[Task 2] History indexed:", indexed)
+    print("[Task 2] Metrics:", metrics.write_report("task2").resolve())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
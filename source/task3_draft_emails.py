@@ -1,31 +1,34 @@
 import os
 import json
 import re
+import hashlib
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from pipeline_io import (
+    iter_delta, write_drafts, append_partial_draft, load_partial_drafts, touch_partial_drafts, clear_partial_drafts,
+)
+from history_store import HistoryStore
+from event_model import Event
+import metrics
+import images as image_cache
+
 load_dotenv()
 
 DATA_DIR = Path("data")
 OUT_DIR = Path("out")
 EMAIL_DIR = OUT_DIR / "emails"
 
-DELTA = DATA_DIR / "events_delta.json"
-DRAFTS_JSON = OUT_DIR / "drafts.json"
-
 SGT = timezone(timedelta(hours=8))
 
 # Optional preference list (we'll auto-pick the first available that supports generateContent)
 PREFERRED_MODELS = ("gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.5-pro")
 
-
-def load_json(path: Path, default):
-    if not path.exists():
-        return default
-    return json.loads(path.read_text(encoding="utf-8"))
+# Histogram buckets for tokens per LLM call
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
 
 
 def clean_money(v: str) -> str:
@@ -43,20 +46,15 @@ def safe_text(s: str, limit: int = 800) -> str:
     return s[:limit]
 
 
-def build_prompt(event: dict) -> str:
-    e = event.get("event", {})
-    dt = e.get("datetime", {})
-    pricing = e.get("pricing", {})
-    reg = event.get("registration", {})
-
-    title = e.get("title", "")
-    date_range = dt.get("date_range", "")
-    time_range = dt.get("time_range", "")
-    location = e.get("location", "")
-    member_price = clean_money(pricing.get("member", ""))
-    non_member_price = clean_money(pricing.get("non_member", ""))
-    signup_link = reg.get("signup_link", "")
-    desc = safe_text(event.get("description_preview", ""), 500)
+def build_prompt(event: Event) -> str:
+    title = event.title
+    date_range = event.dates.date_range
+    time_range = event.dates.time_range
+    location = event.location
+    member_price = clean_money(event.pricing.member)
+    non_member_price = clean_money(event.pricing.non_member)
+    signup_link = event.registration.signup_link
+    desc = safe_text(event.description, 500)
 
     return f"""
 You are drafting a targeted marketing email + WhatsApp invite for SCCCI events.
@@ -99,23 +97,40 @@ def parse_json_response(text: str) -> dict:
     return json.loads(m.group(0))
 
 
-def render_email_html(draft: dict, event: dict) -> str:
-    e = event.get("event", {})
-    dt = e.get("datetime", {})
-    pricing = e.get("pricing", {})
-    reg = event.get("registration", {})
+def hero_image_for(event: dict, cached: dict) -> dict:
+    """
+    Describe the hero image of an event.
+    preview_src is what the HTML preview file uses, email_src what task 4 swaps in.
+    """
+    urls = image_cache.event_image_urls(event)
+    if not urls:
+        return {}
+    url = urls[0]
+    local = cached.get(url)
+    if not local:
+        return {"url": url, "preview_src": url, "email_src": url}
+    return {
+        "url": url,
+        "hash": local["hash"],
+        "file": local["file"],
+        # out/emails/<id>.html -> out/images/<file>
+        "preview_src": f"../images/{local['file']}",
+        "email_src": image_cache.email_src(local) or url,
+    }
+
 
-    title = e.get("title", "")
-    date_range = dt.get("date_range", "")
-    time_range = dt.get("time_range", "")
-    location = e.get("location", "")
-    member_price = pricing.get("member", "")
-    non_member_price = pricing.get("non_member", "")
-    signup_link = reg.get("signup_link", "")
+def render_email_html(draft: dict, event: Event, hero_img: str = None) -> str:
+    title = event.title
+    date_range = event.dates.date_range
+    time_range = event.dates.time_range
+    location = event.location
+    member_price = event.pricing.member
+    non_member_price = event.pricing.non_member
+    signup_link = event.registration.signup_link
 
-    media = event.get("media", {})
-    images = (media.get("images") or {}).get("items", [])
-    hero_img = images[0].get("url") if images else ""
+    if hero_img is None:
+        urls = event.image_urls
+        hero_img = urls[0] if urls else ""
 
     subject = (draft.get("subject") or "").strip()
     blurb = (draft.get("email_blurb") or "").strip()
@@ -173,6 +188,25 @@ def render_email_html(draft: dict, event: dict) -> str:
 """
 
 
+def input_key(change_type: str, event: Event) -> str:
+    """
+    Hash of what a draft is generated from; a finished draft is reused only if this still matches.
+    The task 2 digest covers the emailed fields, the description feeds the prompt; source/stale don't matter.
+    """
+    payload = json.dumps([change_type, event.digest, event.description], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def record_token_usage(resp, model_name: str):
+    usage = getattr(resp, "usage_metadata", None)
+    if not usage:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        count = getattr(usage, attr, 0) or 0
+        metrics.inc("llm_tokens", count, model=model_name, kind=kind)
+        metrics.observe("llm_call_tokens", count, buckets=TOKEN_BUCKETS, model=model_name, kind=kind)
+
+
 def pick_model_name(prefer=PREFERRED_MODELS) -> str:
     """
     Auto-select a model that supports generateContent for your API key.
@@ -200,19 +234,18 @@ def main():
     OUT_DIR.mkdir(parents=True, exist_ok=True)
     EMAIL_DIR.mkdir(parents=True, exist_ok=True)
 
-    delta = load_json(DELTA, {})
-    items = delta.get("items", [])
-
     api_key = os.getenv("GEMINI_API_KEY", "").strip()
     if not api_key:
         print("[Task 3] GEMINI_API_KEY not set. Skipping GenAI drafting.")
         # still write an empty drafts.json so frontend works
         OUT_DIR.mkdir(parents=True, exist_ok=True)
         EMAIL_DIR.mkdir(parents=True, exist_ok=True)
-        DRAFTS_JSON.write_text(json.dumps({
-            "summary": {"run_at": datetime.now(SGT).isoformat(), "input_items": 0, "drafted": 0, "errors": 0},
-            "items": []
-        }, ensure_ascii=False, indent=2), encoding="utf-8")
+        write_drafts(
+            {"run_at": datetime.now(SGT).isoformat(), "input_items": 0, "drafted": 0, "errors": 0},
+            [],
+            OUT_DIR,
+        )
+        metrics.write_report("task3")
         return
 
     genai.configure(api_key=api_key)
@@ -223,28 +256,61 @@ def main():
     model = genai.GenerativeModel(model_name)
 
     drafts_out = []
+    input_items = 0
     run_at = datetime.now(SGT).isoformat()
 
-    for item in items:
-        change_type = item.get("change_type", "")
-        event_id = item.get("event_id", "")
-        event = item.get("event", {})
+    # stream delta items (works for both events_delta.json and events_delta.jsonl)
+    todo = []
+    for item in iter_delta(DATA_DIR):
+        if "event_id" not in item:
+            continue  # summary record
+        input_items += 1
 
-        status = (((event.get("event") or {}).get("status")) or "").strip()
-        signup_link = (((event.get("registration") or {}).get("signup_link")) or "").strip()
+        change_type = item.get("change_type", "")
+        typed = Event.from_dict(item.get("event") or {})
 
         # rules: only NEW/UPDATED + Open + has signup link
         if change_type not in ("NEW", "UPDATED"):
             continue
-        if status != "Open":
+        if typed.status.strip() != "Open":
             continue
-        if not signup_link:
+        if not typed.registration.signup_link.strip():
+            continue
+        todo.append((item, typed))
+
+    # drafts finished by an interrupted run (out/drafts.partial.jsonl); its sidecar is live again from here
+    finished = load_partial_drafts(OUT_DIR)
+    touch_partial_drafts(OUT_DIR)
+    resumed = 0
+
+    # fetch + resize hero images for all drafts up front (concurrent, cached by content hash)
+    cached_images = {}
+    if image_cache.IMAGE_MODE != "hotlink":
+        hero_urls = [typed.image_urls[0] for _, typed in todo if typed.image_urls]
+        with metrics.timer("image_cache_seconds"):
+            cached_images = image_cache.cache_images(hero_urls)
+        print(f"[Task 3] Images cached: {len(cached_images)}/{len(set(hero_urls))}")
+
+    for item, typed in todo:
+        change_type = item.get("change_type", "")
+        event_id = item.get("event_id", "")
+        event = item.get("event", {})
+        key = input_key(change_type, typed)
+
+        prev = finished.get(event_id)
+        if (prev and "draft" in prev and prev.get("input_key") == key
+                and Path(prev.get("email_preview_path", "")).exists()):
+            prev.pop("input_key")
+            drafts_out.append(prev)
+            resumed += 1
             continue
 
-        prompt = build_prompt(event)
+        prompt = build_prompt(typed)
 
         try:
-            resp = model.generate_content(prompt)
+            with metrics.timer("llm_seconds", model=model_name):
+                resp = model.generate_content(prompt)
+            record_token_usage(resp, model_name)
             draft = parse_json_response(getattr(resp, "text", ""))
 
             draft = {
@@ -254,45 +320,64 @@ def main():
             }
 
             # Save email HTML preview
-            html = render_email_html(draft, event)
-            preview_path = EMAIL_DIR / f"{event_id}.html"
-            preview_path.write_text(html, encoding="utf-8")
+            hero = hero_image_for(event, cached_images)
+            with metrics.timer("render_seconds"):
+                html = render_email_html(draft, typed, hero.get("preview_src", ""))
+                preview_path = EMAIL_DIR / f"{event_id}.html"
+                preview_path.write_text(html, encoding="utf-8")
 
-            drafts_out.append({
+            record = {
                 "event_id": event_id,
                 "change_type": change_type,
                 "generated_at": run_at,
                 "draft": draft,
                 "event": event,
                 "email_preview_path": str(preview_path),
-            })
+                "hero_image": hero,
+                **({"duplicate_of": item["duplicate_of"]} if item.get("duplicate_of") else {}),
+            }
 
             print(f"[Task 3] Drafted: {event_id} ({draft['subject'][:45]}...)")
 
         except Exception as e:
-            drafts_out.append({
+            metrics.inc("draft_errors")
+            record = {
                 "event_id": event_id,
                 "change_type": change_type,
                 "generated_at": run_at,
                 "error": str(e),
                 "event": event,
-            })
+            }
             print(f"[Task 3] ERROR {event_id}: {e}")
 
-    output = {
-        "summary": {
-            "run_at": run_at,
-            "input_items": len(items),
-            "drafted": sum(1 for d in drafts_out if "draft" in d),
-            "errors": sum(1 for d in drafts_out if "error" in d),
-        },
-        "items": drafts_out,
+        # durable as soon as it lands: survives a crash and shows up on the dashboard
+        append_partial_draft({**record, "input_key": key}, OUT_DIR)
+        drafts_out.append(record)
+
+    if resumed:
+        print(f"[Task 3] Resumed {resumed} draft(s) from an interrupted run")
+        metrics.inc("drafts_resumed", resumed)
+
+    summary = {
+        "run_at": run_at,
+        "input_items": input_items,
+        "drafted": sum(1 for d in drafts_out if "draft" in d),
+        "errors": sum(1 for d in drafts_out if "error" in d),
+        "resumed": resumed,
     }
 
-    DRAFTS_JSON.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
-    print("[Task 3] Saved:", DRAFTS_JSON.resolve())
+    # compact the sidecar into drafts.json / drafts.jsonl
+    drafts_path = write_drafts(summary, drafts_out, OUT_DIR)
+    clear_partial_drafts(OUT_DIR)
+    print("[Task 3] Saved:", drafts_path.resolve())
     print("[Task 3] Email previews:", EMAIL_DIR.resolve())
 
+    with metrics.timer("history_index_seconds"):
+        HistoryStore().index_drafts(drafts_out)
+
+    metrics.inc("drafts_created", summary["drafted"])
+    print("[Task 3] Metrics:", metrics.write_report("task3").resolve())
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,3 +1,4 @@
+import os
 import json
 import time
 from pathlib import Path
@@ -5,30 +6,72 @@ import win32com.client as win32
 import pythoncom  
 # import schedule  # ← uncomment when using scheduler
 
+from recipients_store import RecipientStore
+from history_store import HistoryStore
+from pipeline_io import iter_drafts, jsonl_path, DRAFTS_JSONL
+import metrics
+
 # Files
 DRAFTS_FILE = "out/drafts.json"
 SENT_FILE = "out/sent_emails.json"
 RECIPIENTS_FILE = "out/recipients.json"
+RECIPIENTS_DB = "out/recipients.db"
+IMAGE_DIR = Path("out/images")
+
+THROTTLE_SECONDS = 2
+
+# Recipients go in BCC (never a visible list), this many per message; stays under Outlook/Exchange recipient limits
+RECIPIENT_BATCH_SIZE = int(os.getenv("RECIPIENT_BATCH_SIZE", "400"))
+
+# MAPI properties for inline (cid:) attachments
+PR_ATTACH_CONTENT_ID = "http://schemas.microsoft.com/mapi/proptag/0x3712001F"
+PR_ATTACHMENT_HIDDEN = "http://schemas.microsoft.com/mapi/proptag/0x7FFE000B"
+
+# Optional segment tag; empty = everyone in the store
+RECIPIENT_SEGMENT = os.getenv("RECIPIENT_SEGMENT", "").strip()
 
 
 def load_recipients():
-    path = Path(RECIPIENTS_FILE)
-    if not path.exists():
-        return []
-    data = json.loads(path.read_text(encoding="utf-8"))
-    return data.get("emails", [])
+    store = RecipientStore(RECIPIENTS_DB, legacy_json=RECIPIENTS_FILE)
+    return store.emails(RECIPIENT_SEGMENT)
+
+
+def attach_hero_image(mail, html: str, hero: dict) -> str:
+    """
+    Swap the preview's local image path for what the email should use.
+    cid: images are attached inline (hidden) with a matching Content-ID.
+    """
+    preview_src = hero.get("preview_src", "")
+    email_src = hero.get("email_src", "")
+    if not preview_src or preview_src == email_src:
+        return html
+
+    if email_src.startswith("cid:"):
+        image_path = IMAGE_DIR / hero.get("file", "")
+        if not image_path.is_file():
+            return html.replace(preview_src, hero.get("url", ""))
+        attachment = mail.Attachments.Add(str(image_path.resolve()))
+        attachment.PropertyAccessor.SetProperty(PR_ATTACH_CONTENT_ID, email_src[len("cid:"):])
+        attachment.PropertyAccessor.SetProperty(PR_ATTACHMENT_HIDDEN, True)
+
+    return html.replace(preview_src, email_src)
+
+
+def recipient_batches(recipients: list[str], size: int = RECIPIENT_BATCH_SIZE):
+    for i in range(0, len(recipients), size):
+        yield recipients[i:i + size]
 
 
 def send_emails():
     pythoncom.CoInitialize()
     try:
         drafts_path = Path(DRAFTS_FILE)
-        if not drafts_path.exists():
+        if not drafts_path.exists() and not jsonl_path(Path("out") / DRAFTS_JSONL).exists():
             print(f"No drafts found at {DRAFTS_FILE}")
             return
 
-        drafts_json = json.loads(drafts_path.read_text(encoding="utf-8"))
-        items = drafts_json.get("items", [])
+        # drafts.json or drafts.jsonl, read item by item
+        items = [d for d in iter_drafts(Path("out")) if "event_id" in d]
 
         if not items:
             print("No email items found in drafts.")
@@ -37,13 +80,14 @@ def send_emails():
         # 🔑 Load recipients ONCE per run
         recipients = load_recipients()
         if not recipients:
-            print("⚠ No recipients configured in out/recipients.json")
+            print("⚠ No recipients configured in out/recipients.db")
             return
 
         sent_path = Path(SENT_FILE)
         sent_ids = json.loads(sent_path.read_text()) if sent_path.exists() else []
 
         outlook = win32.Dispatch("Outlook.Application")
+        history = HistoryStore()
         sent_count = 0
 
         for item in items:
@@ -51,42 +95,58 @@ def send_emails():
             if event_id in sent_ids:
                 continue
 
+            if "draft" not in item:
+                continue  # drafting failed for this event
+
             html_path = Path(item.get("email_preview_path", ""))
             if not html_path.exists():
                 print(f"HTML file not found: {html_path}")
                 continue
 
-            html_content = html_path.read_text(encoding="utf-8")
-
-            mail = outlook.CreateItem(0)  # olMailItem
-            mail.Subject = item["draft"].get("subject", "No Subject")
-            mail.HTMLBody = html_content
-            mail.To = "; ".join(recipients)
-
-            # Store values BEFORE sending
-            subject = mail.Subject
-            recipient_str = ", ".join(recipients)
-
-            try:
-                mail.Send()
-                print(f"✅ Sent: {subject} → {recipient_str}")
+            html_template = html_path.read_text(encoding="utf-8")
+            subject = item["draft"].get("subject", "No Subject")
+            failed_batches = 0
+
+            # One message per batch, addresses in BCC so members never see each other
+            for batch in recipient_batches(recipients):
+                mail = outlook.CreateItem(0)  # olMailItem
+                mail.Subject = subject
+                mail.HTMLBody = attach_hero_image(mail, html_template, item.get("hero_image") or {})
+                mail.BCC = "; ".join(batch)
+
+                try:
+                    with metrics.timer("send_seconds"):
+                        mail.Send()
+                    print(f"✅ Sent: {subject} → {len(batch)} recipient(s) (BCC)")
+                    metrics.inc("messages_sent")
+                    metrics.inc("recipients_addressed", len(batch))
+                except Exception as e:
+                    failed_batches += 1
+                    metrics.inc("send_errors")
+                    print(f"⚠ Send error (likely false): {subject} | {e}")
+
+                mail = None
+                time.sleep(THROTTLE_SECONDS)  # throttle (important after account unblock)
+                metrics.inc("throttles")
+                metrics.inc("throttle_seconds", THROTTLE_SECONDS)
+
+            if not failed_batches:
                 sent_ids.append(event_id)
+                history.mark_sent(event_id)
                 sent_count += 1
-            except Exception as e:
-                print(f"⚠ Send error (likely false): {subject} | {e}")
-
-            mail = None
-            time.sleep(2)  # throttle (important after account unblock)
+                metrics.inc("emails_sent")
 
         sent_path.write_text(json.dumps(sent_ids, indent=2))
         print(f"\n📨 Done. {sent_count} email(s) sent.")
 
     finally:
+        metrics.write_report("task4")
         pythoncom.CoUninitialize()
 
 
 # 🔹 TESTING (manual run)
-send_emails()
+if __name__ == "__main__":
+    send_emails()
 
 
 # 🔹 PRODUCTION (biweekly scheduler)